@@ -0,0 +1,83 @@
+import argparse
+import re
+import sys
+import tempfile
+import time
+
+from soak_harness import SUCCESS_MARKER, launch_scraper, start_fake_site
+
+THROUGHPUT_PATTERN = re.compile(r"Listing throughput: ([\d.]+) listings/min with (\d+) tab")
+
+def run_once(base_url, tabs, pages, timeout):
+    """Scrape one town on the fake site with `tabs` listing tabs and return its measurements"""
+    work_dir = tempfile.mkdtemp(prefix=f"bench_tabs_{tabs}_")
+    started = time.time()
+    # Town 1 only, `pages` map pages, no time budget; every listing goes through the browser tabs
+    scraper = launch_scraper(
+        base_url, work_dir, answers=f"1\n{pages}\n\n",
+        extra_env={"SCRAPER_TABS_PER_BROWSER": str(tabs), "SCRAPER_HTTP_FAST_PATH": "0"}
+    )
+
+    listings = 0
+    rate = None
+    for line in scraper.stdout:
+        if SUCCESS_MARKER in line:
+            listings += 1
+        match = THROUGHPUT_PATTERN.search(line)
+        if match:
+            rate = float(match.group(1))
+        if time.time() - started > timeout:
+            scraper.kill()
+            print(f"⚠️ {tabs}-tab run timed out after {timeout:.0f} seconds")
+            break
+    scraper.wait()
+
+    return {"tabs": tabs, "listings": listings, "listings_per_min": rate, "wall_seconds": time.time() - started}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-tab listing mode against the single-tab baseline")
+    parser.add_argument("--tabs", default="1,2,4", help="Comma-separated tab counts; 1 is the baseline")
+    parser.add_argument("--pages", type=int, default=3, help="Map pages of 12 listings to scrape per run")
+    parser.add_argument("--listing-delay", type=float, default=1.5, help="Simulated network latency per listing page")
+    parser.add_argument("--timeout", type=float, default=1800, help="Give up on a run after this many seconds")
+    args = parser.parse_args()
+
+    tab_counts = [int(count) for count in args.tabs.split(",")]
+    if 1 not in tab_counts:
+        tab_counts.insert(0, 1)
+
+    # The fast path is switched off in the scraper; blocking plain HTTP as well keeps it that way
+    server = start_fake_site({
+        "pages_per_town": args.pages,
+        "missing_cards_rate": 0.0,
+        "disabled_next_rate": 0.0,
+        "listing_timeout_rate": 0.0,
+        "http_block_rate": 1.0,
+        "listing_delay": args.listing_delay,
+    })
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"🧪 Fake site at {base_url} with {args.listing_delay}s listing latency")
+
+    results = []
+    try:
+        for tabs in tab_counts:
+            print(f"\n🔄 Running with {tabs} tab(s)...")
+            results.append(run_once(base_url, tabs, args.pages, args.timeout))
+    finally:
+        server.shutdown()
+
+    baseline = next(result for result in results if result["tabs"] == 1)
+    print(f"\n📊 Multi-tab benchmark ({args.pages} pages, {args.listing_delay}s latency)")
+    for result in results:
+        if result["listings_per_min"] is None or not baseline["listings_per_min"]:
+            print(f"   {result['tabs']} tab(s): no throughput reported ({result['listings']} listings)")
+            continue
+        speedup = result["listings_per_min"] / baseline["listings_per_min"]
+        print(f"   {result['tabs']} tab(s): {result['listings_per_min']:.1f} listings/min, "
+              f"{result['listings']} listings in {result['wall_seconds']:.0f}s, {speedup:.2f}x baseline")
+
+    if any(result["listings_per_min"] is None for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from listing_parser import is_complete, parse_listing_html
+
+# Text that shows up on bot-protection and error pages instead of a listing
+BLOCK_MARKERS = ("_Incapsula_Resource", "Incapsula incident", "Request unsuccessful", "captcha")
+
+def create_session(user_agent=None, cookies=None, pool_size=4):
+    """Create a pooled keep-alive HTTP session with optional browser headers and cookies"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "en-CA,en;q=0.9",
+        "Connection": "keep-alive",
+    })
+    if user_agent:
+        session.headers["User-Agent"] = user_agent
+    for cookie in cookies or []:
+        session.cookies.set(
+            cookie["name"], cookie["value"],
+            domain=cookie.get("domain", ""), path=cookie.get("path", "/")
+        )
+    return session
+
+def session_from_driver(driver, pool_size=4):
+    """Create a session that reuses the live browser's user agent and cookies"""
+    user_agent = driver.execute_script("return navigator.userAgent;")
+    return create_session(user_agent=user_agent, cookies=driver.get_cookies(), pool_size=pool_size)
+
+def fetch_listing(session, url, timeout=8):
+    """Fetch and parse a listing page over plain HTTP
+
+    Returns (fields, html, reason): fields is None when the page was blocked,
+    failed or is missing required fields, and reason says why.
+    """
+    try:
+        response = session.get(url, timeout=timeout)
+    except requests.RequestException as e:
+        return None, None, f"request error: {str(e)[:100]}"
+
+    if response.status_code != 200:
+        return None, None, f"HTTP {response.status_code}"
+
+    html = response.text
+    if any(marker in html for marker in BLOCK_MARKERS):
+        return None, html, "blocked"
+
+    fields = parse_listing_html(html)
+    if not is_complete(fields):
+        return None, html, "incomplete"
+    return fields, html, None
@@ -0,0 +1,326 @@
+import datetime
+import json
+import re
+from collections import deque
+from html.parser import HTMLParser
+
+from dateutil.relativedelta import relativedelta
+
+# Output field -> (tag or None for any tag, attribute to match, value to match, attribute to read or None for text)
+LISTING_SELECTORS = {
+    "agent_name": (None, "class", "realtorCardName", None),
+    "phone": (None, "class", "realtorCardContactNumber", None),
+    "email": (None, "class", "agent-email", "href"),
+    "website": ("a", "class", "realtorCardWebsite", "href"),
+    "price": (None, "id", "listingPrice", None),
+    "address": (None, "id", "listingAddress", None),
+    "posted_raw": (None, "class", "ConditionallyTimeOnRealtorCon", None),
+    "photo_text": (None, "id", "btnPhotoCount", None),
+    "brokerage": ("div", "class", "officeCardName", None),
+}
+
+# Fields the HTTP fast path needs before it can skip the browser; contact details are the point of a row
+REQUIRED_FIELDS = ("address", "price", "agent_name", "phone", "brokerage")
+
+# Script blocks that may hold structured listing data
+STRUCTURED_SCRIPT_TYPES = ("application/ld+json", "application/json")
+
+# schema.org types of the listing itself, as opposed to the agent, brokerage or page
+LISTING_TYPES = {
+    "RealEstateListing", "Product", "Offer", "Residence", "House",
+    "SingleFamilyResidence", "Apartment", "Accommodation",
+}
+
+# Tags that never have a closing tag
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+def parse_posted_time(relative_time, now=None):
+    """Convert a relative time such as '3 hours ago' to a 'YYYY-MM-DD HH:00' timestamp"""
+    now = (now or datetime.datetime.now()).replace(minute=0, second=0, microsecond=0)
+    number = int(re.search(r'\d+', relative_time).group()) if re.search(r'\d+', relative_time) else 0
+    if 'hour' in relative_time:
+        return (now - datetime.timedelta(hours=number)).strftime('%Y-%m-%d %H:00')
+    elif 'minute' in relative_time:
+        return (now - datetime.timedelta(minutes=number)).strftime('%Y-%m-%d %H:00')
+    elif 'day' in relative_time:
+        return (now - datetime.timedelta(days=number)).strftime('%Y-%m-%d %H:00')
+    elif 'week' in relative_time:
+        return (now - datetime.timedelta(weeks=number)).strftime('%Y-%m-%d %H:00')
+    elif 'month' in relative_time:
+        return (now - relativedelta(months=number)).strftime('%Y-%m-%d %H:00')
+    elif 'year' in relative_time:
+        return (now - relativedelta(years=number)).strftime('%Y-%m-%d %H:00')
+    return now.strftime('%Y-%m-%d %H:00')
+
+def parse_json_blocks(texts):
+    """Parse JSON script contents, skipping blocks that are empty or invalid"""
+    blocks = []
+    for text in texts:
+        try:
+            blocks.append(json.loads(text))
+        except (TypeError, ValueError):
+            continue
+    return blocks
+
+def _iter_objects(data):
+    """Yield every dict nested anywhere in parsed JSON, outermost first"""
+    pending = deque([data])
+    while pending:
+        item = pending.popleft()
+        if isinstance(item, dict):
+            yield item
+            pending.extend(item.values())
+        elif isinstance(item, list):
+            pending.extend(item)
+
+def _types(obj):
+    """The schema.org @type of an object as a set"""
+    value = obj.get("@type")
+    if isinstance(value, list):
+        return set(value)
+    return {value} if value else set()
+
+def _format_price(price):
+    """Format a numeric structured-data price like the page does ('$1,099,000')"""
+    try:
+        return f"${float(str(price).replace(',', '')):,.0f}"
+    except ValueError:
+        return str(price)
+
+def _format_address(address):
+    """Format a PostalAddress object (or plain string) as 'street, locality, region postal code'"""
+    if isinstance(address, str):
+        return address
+    if not isinstance(address, dict):
+        return ""
+    region = f"{address.get('addressRegion', '')} {address.get('postalCode', '')}".strip()
+    parts = [address.get("streetAddress"), address.get("addressLocality"), region]
+    return ", ".join(part for part in parts if part)
+
+def map_structured_data(blocks):
+    """Map JSON-LD and embedded application-state objects to raw listing fields
+
+    Returns only the fields that were found. Besides the LISTING_SELECTORS
+    fields this can yield "locality" (the breadcrumb hierarchy) and
+    "posted_at" (an absolute listing date).
+    """
+    fields = {}
+    people = []
+    agencies = []
+
+    def put(field, value):
+        if value and not fields.get(field):
+            fields[field] = str(value).strip()
+
+    for block in blocks:
+        for obj in _iter_objects(block):
+            types = _types(obj)
+
+            if "BreadcrumbList" in types:
+                names = []
+                for item in obj.get("itemListElement") or []:
+                    if isinstance(item, dict):
+                        name = item.get("name")
+                        if not name and isinstance(item.get("item"), dict):
+                            name = item["item"].get("name")
+                        if name:
+                            names.append(name)
+                put("locality", " > ".join(names))
+
+            # Address and photos only come from the listing, never the agent or brokerage
+            if types & LISTING_TYPES or "offers" in obj:
+                put("address", _format_address(obj.get("address")))
+                item = obj.get("itemOffered")
+                if isinstance(item, dict):
+                    put("address", _format_address(item.get("address")))
+                images = obj.get("image")
+                if isinstance(images, list) and images:
+                    put("photo_text", len(images))
+
+            offers = obj.get("offers")
+            if isinstance(offers, list):
+                offers = offers[0] if offers else None
+            if isinstance(offers, dict) and offers.get("price") not in (None, ""):
+                put("price", _format_price(offers["price"]))
+
+            if "Person" in types:
+                people.append(obj)
+            elif "RealEstateAgent" in types:
+                agencies.append(obj)
+
+            put("posted_at", obj.get("datePosted"))
+
+            # realtor.ca application state uses the same shape as its listing API
+            property_data = obj.get("Property")
+            if isinstance(property_data, dict):
+                address = property_data.get("Address") or {}
+                if isinstance(address, dict):
+                    put("address", (address.get("AddressText") or "").replace("|", ", "))
+                put("price", property_data.get("Price"))
+                photos = property_data.get("Photo")
+                if isinstance(photos, list) and photos:
+                    put("photo_text", len(photos))
+                put("posted_raw", obj.get("TimeOnRealtor"))
+
+            individuals = obj.get("Individual")
+            if isinstance(individuals, list) and individuals and isinstance(individuals[0], dict):
+                agent = individuals[0]
+                put("agent_name", agent.get("Name"))
+                phones = agent.get("Phones") or []
+                if phones and isinstance(phones[0], dict):
+                    phone = phones[0]
+                    put("phone", "-".join(part for part in (phone.get("AreaCode"), phone.get("PhoneNumber")) if part))
+                websites = agent.get("Websites") or []
+                if websites and isinstance(websites[0], dict):
+                    put("website", websites[0].get("Website"))
+                organization = agent.get("Organization")
+                if isinstance(organization, dict):
+                    put("brokerage", organization.get("Name"))
+
+    # A Person is the listing agent; a RealEstateAgent is the brokerage
+    if people:
+        agent = people[0]
+        put("agent_name", agent.get("name"))
+        put("phone", agent.get("telephone"))
+        put("email", agent.get("email"))
+        put("website", agent.get("url"))
+        employer = agent.get("worksFor") or agent.get("memberOf")
+        if isinstance(employer, dict):
+            put("brokerage", employer.get("name"))
+    if agencies:
+        put("brokerage", agencies[0].get("name"))
+
+    return fields
+
+def fill_missing_fields(fields, read_field):
+    """Fill LISTING_SELECTORS fields missing from structured data using read_field(field)
+
+    Returns a field -> "structured" / "dom" map of where each value came from.
+    A structured "posted_at" date covers "posted_raw", which is then not read.
+    """
+    sources = {field: "structured" for field, value in fields.items() if value}
+    if fields.get("posted_at"):
+        fields.setdefault("posted_raw", "")
+        sources["posted_raw"] = "structured"
+    for field in LISTING_SELECTORS:
+        if not fields.get(field) and field not in sources:
+            fields[field] = read_field(field) or ""
+            if fields[field]:
+                sources[field] = "dom"
+    return sources
+
+class ListingPageParser(HTMLParser):
+    """Collect the first match of each LISTING_SELECTORS entry and structured script blocks from raw HTML"""
+
+    def __init__(self, selectors=LISTING_SELECTORS):
+        super().__init__(convert_charrefs=True)
+        self.selectors = selectors
+        self.fields = {}
+        self.stack = []
+        self.capturing = {}  # Field -> (stack depth, collected text chunks)
+        self.scripts = []
+        self.script_chunks = None
+
+    def _matches(self, tag, attrs, selector):
+        selector_tag, match_attr, match_value, _ = selector
+        if selector_tag and tag != selector_tag:
+            return False
+        value = attrs.get(match_attr) or ""
+        if match_attr == "class":
+            return match_value in value.split()
+        return value == match_value
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "script" and (attrs.get("type") in STRUCTURED_SCRIPT_TYPES or attrs.get("id") == "__NEXT_DATA__"):
+            self.script_chunks = []
+        for field, selector in self.selectors.items():
+            if field in self.fields or field in self.capturing:
+                continue
+            if self._matches(tag, attrs, selector):
+                read_attr = selector[3]
+                if read_attr:
+                    self.fields[field] = (attrs.get(read_attr) or "").strip()
+                elif tag not in VOID_TAGS:
+                    self.capturing[field] = (len(self.stack), [])
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag == "script" and self.script_chunks is not None:
+            self.scripts.append("".join(self.script_chunks))
+            self.script_chunks = None
+        if tag not in self.stack:
+            return
+        # Pop up to the matching open tag, tolerating unclosed children
+        while self.stack:
+            if self.stack.pop() == tag:
+                break
+        for field, (depth, chunks) in list(self.capturing.items()):
+            if len(self.stack) <= depth:
+                self.fields[field] = " ".join(" ".join(chunks).split())
+                del self.capturing[field]
+
+    def handle_data(self, data):
+        if self.script_chunks is not None:
+            self.script_chunks.append(data)
+        for _, chunks in self.capturing.values():
+            chunks.append(data)
+
+def parse_listing_html(html, structured=None):
+    """Parse raw listing page HTML into raw field values
+
+    Structured data is used first and the HTML selectors fill whatever it lacks;
+    fields["sources"] records where each value came from. Missing fields are "".
+    `structured` replaces the page's script blocks with the JSON texts the live
+    browser read, which also include window state that isn't in the HTML.
+    """
+    parser = ListingPageParser()
+    parser.feed(html)
+    parser.close()
+    fields = map_structured_data(parse_json_blocks(parser.scripts if structured is None else structured))
+    fields["sources"] = fill_missing_fields(fields, parser.fields.get)
+    return fields
+
+def is_complete(fields):
+    """Whether parsed fields include everything the HTTP fast path needs to skip the browser"""
+    return all(fields.get(field) for field in REQUIRED_FIELDS)
+
+def build_listing_record(fields, url, town, listing_counts, now=None):
+    """Turn raw field values into an output row, updating the per-agent listing counts"""
+    agent_name = fields.get("agent_name", "")
+    address = fields.get("address", "").replace("\n", " ")
+
+    try:
+        posted_raw = fields.get("posted_raw", "").strip()
+        if fields.get("posted_at"):
+            posted = datetime.datetime.fromisoformat(fields["posted_at"][:19]).strftime('%Y-%m-%d %H:00')
+        else:
+            posted = parse_posted_time(posted_raw, now) if posted_raw else ""
+    except Exception:
+        posted = ""
+
+    # Clean the street address
+    cleaned_address = address.split(',')[0].strip().title() if address else ""
+
+    first_name = agent_name.split()[0].capitalize() if agent_name else ""
+    last_name = agent_name.split()[-1].capitalize() if agent_name and len(agent_name.split()) > 1 else ""
+    full_name_key = f"{first_name} {last_name}"
+    listing_counts[full_name_key] += 1
+
+    return {
+        "First Name": first_name,
+        "Last Name": last_name,
+        "Email": (fields.get("email") or "").replace("mailto:", ""),
+        "Phone": fields.get("phone", ""),
+        "Website": fields.get("website", ""),
+        "Price": fields.get("price", ""),
+        "Number of Listings": listing_counts[full_name_key],
+        "Number of Photos": (fields.get("photo_text") or "").replace("+", "").strip(),
+        "Street Address": cleaned_address,
+        "Date Posted": posted,
+        "Listing URL": url,
+        "Town": town,
+        "Brokerage": fields.get("brokerage", "").strip(),
+        "Locality": fields.get("locality", "")
+    }
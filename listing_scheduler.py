@@ -0,0 +1,79 @@
+import re
+
+# Relative weight of listings whose agent we already have full contact details for
+KNOWN_CONTACT_WEIGHT = 0.1
+# Relative weight of listings already in the store whose agent is missing contact details
+KNOWN_LISTING_WEIGHT = 0.5
+# Listings scoring below this are deferred behind everything else
+LOW_VALUE_SCORE = 0.2
+
+def parse_budget(text):
+    """Parse a wall-clock budget such as '45m', '1h30m', '90s' or '2h' into seconds
+
+    A bare number is taken as minutes. Returns None for an empty string.
+    """
+    text = text.strip().lower()
+    if not text:
+        return None
+    if re.fullmatch(r"\d+(\.\d+)?", text):
+        return float(text) * 60
+
+    parts = re.findall(r"(\d+(?:\.\d+)?)\s*([hms])", text)
+    if not parts or re.sub(r"[\d.\shms]", "", text):
+        raise ValueError(f"Invalid time budget: {text}")
+    units = {"h": 3600, "m": 60, "s": 1}
+    return sum(float(value) * units[unit] for value, unit in parts)
+
+def posted_hours_ago(posted_raw):
+    """Approximate age in hours of a relative time such as '3 days ago', or None if unknown"""
+    if not posted_raw:
+        return None
+    match = re.search(r"\d+", posted_raw)
+    number = int(match.group()) if match else 0
+    for unit, hours in (("minute", 1 / 60), ("hour", 1), ("day", 24), ("week", 168), ("month", 730), ("year", 8760)):
+        if unit in posted_raw:
+            return number * hours
+    return None
+
+def score_listing(url, posted_raw, known_contact_urls, known_urls):
+    """Expected value of scraping a listing: new listings from fresh cards score highest"""
+    if url in known_contact_urls:
+        score = KNOWN_CONTACT_WEIGHT
+    elif url in known_urls:
+        score = KNOWN_LISTING_WEIGHT
+    else:
+        score = 1.0
+
+    # Fresh listings are more likely to come from agents we have not seen yet
+    hours = posted_hours_ago(posted_raw)
+    if hours is not None:
+        score *= 1 / (1 + hours / 168)
+    return score
+
+def prioritize_listings(urls, card_posted, known_contact_urls, known_urls):
+    """Order listing URLs by expected value; returns (ordered urls, number of low-value urls deferred)"""
+    scores = {url: score_listing(url, card_posted.get(url, ""), known_contact_urls, known_urls) for url in urls}
+    # sorted() is stable, so equal scores keep their page order
+    ordered = sorted(urls, key=lambda url: scores[url], reverse=True)
+    deferred = sum(1 for url in urls if scores[url] < LOW_VALUE_SCORE)
+    return ordered, deferred
+
+def summarize_yield(samples, bucket_minutes=5):
+    """Group yield samples into per-bucket new-agent counts and rates
+
+    Each sample is a dict with "Elapsed Minutes" and cumulative "New Agents".
+    Returns a list of (bucket start minute, new agents in bucket, new agents per minute).
+    """
+    buckets = []
+    previous_total = 0
+    bucket_start = 0
+    last_total = 0
+    for sample in samples:
+        while sample["Elapsed Minutes"] >= bucket_start + bucket_minutes:
+            buckets.append((bucket_start, last_total - previous_total, (last_total - previous_total) / bucket_minutes))
+            previous_total = last_total
+            bucket_start += bucket_minutes
+        last_total = sample["New Agents"]
+    if samples:
+        buckets.append((bucket_start, last_total - previous_total, (last_total - previous_total) / bucket_minutes))
+    return buckets
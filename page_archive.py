@@ -0,0 +1,41 @@
+import datetime
+import gzip
+import json
+import zlib
+
+def append_page(path, url, html, kind, town, fetched_at=None, structured=None):
+    """Append one page to the archive as its own gzip member
+
+    Each member holds a JSON header line (url, kind, town, fetched_at, length and
+    optionally the structured-data texts read from the live page) followed by the
+    UTF-8 HTML, so a crash can only ever cut off the last page.
+    """
+    body = (html or "").encode("utf-8")
+    header = {
+        "url": url,
+        "kind": kind,
+        "town": town,
+        "fetched_at": (fetched_at or datetime.datetime.now()).isoformat(timespec="seconds"),
+        "length": len(body),
+    }
+    if structured is not None:
+        header["structured"] = structured
+    record = json.dumps(header).encode("utf-8") + b"\n" + body
+    with open(path, "ab") as f:
+        f.write(gzip.compress(record))
+
+def iter_pages(path, kind=None):
+    """Yield (header, html) for every archived page, optionally only pages of one kind"""
+    with gzip.open(path, "rb") as f:
+        while True:
+            try:
+                line = f.readline()
+                if not line:
+                    return
+                header = json.loads(line)
+                body = f.read(header["length"])
+            except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError) as e:
+                print(f"⚠️ Archive {path} ends with a truncated record, stopping: {e}")
+                return
+            if kind is None or header.get("kind") == kind:
+                yield header, body.decode("utf-8", errors="replace")
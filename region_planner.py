@@ -0,0 +1,93 @@
+import datetime
+import json
+import os
+
+# Results reachable through map pagination: 50 pages of 12 cards
+MAX_REACHABLE_RESULTS = 50 * 12
+
+def town_bounds(town_data):
+    """Bounding box of a TOWNS entry as floats"""
+    return {
+        "lat_min": float(town_data["lat_min"]),
+        "lat_max": float(town_data["lat_max"]),
+        "long_min": float(town_data["long_min"]),
+        "long_max": float(town_data["long_max"]),
+    }
+
+def split_bounds(bounds):
+    """Split a bounding box into four quadrants that share edges and cover it exactly"""
+    lat_mid = round((bounds["lat_min"] + bounds["lat_max"]) / 2, 5)
+    long_mid = round((bounds["long_min"] + bounds["long_max"]) / 2, 5)
+    return [
+        {"lat_min": bounds["lat_min"], "lat_max": lat_mid, "long_min": bounds["long_min"], "long_max": long_mid},
+        {"lat_min": bounds["lat_min"], "lat_max": lat_mid, "long_min": long_mid, "long_max": bounds["long_max"]},
+        {"lat_min": lat_mid, "lat_max": bounds["lat_max"], "long_min": bounds["long_min"], "long_max": long_mid},
+        {"lat_min": lat_mid, "lat_max": bounds["lat_max"], "long_min": long_mid, "long_max": bounds["long_max"]},
+    ]
+
+def plan_tiles(bounds, count_results, max_results=MAX_REACHABLE_RESULTS, max_depth=4):
+    """Recursively split a region until every tile's result count fits within pagination
+
+    count_results(bounds, depth) returns the result count reported for a box,
+    or None if it could not be read (the box is then kept as is). Returns the
+    leaf tiles, which together cover the region without overlapping.
+    """
+    tiles = []
+    pending = [(bounds, 0)]
+    while pending:
+        box, depth = pending.pop(0)
+        count = count_results(box, depth)
+        if count is not None and count > max_results and depth < max_depth:
+            print(f"🧩 {count} results at depth {depth} exceed {max_results}. Splitting into quadrants...")
+            pending.extend((quadrant, depth + 1) for quadrant in split_bounds(box))
+        else:
+            tiles.append({**box, "depth": depth, "results": count})
+    return tiles
+
+def load_cached_tiles(cache_path, town, bounds, max_results, max_age_days=30):
+    """Return the cached tile plan for a town, or None if missing, stale or planned for other bounds"""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path) as f:
+            entry = json.load(f).get(town)
+    except (OSError, ValueError):
+        return None
+    if not entry or entry.get("bounds") != bounds or entry.get("max_results") != max_results:
+        return None
+
+    planned_at = datetime.datetime.fromisoformat(entry["planned_at"])
+    if datetime.datetime.now() - planned_at > datetime.timedelta(days=max_age_days):
+        return None
+    return entry["tiles"]
+
+def drop_cached_tiles(cache_path, town):
+    """Remove a town's tile plan from the JSON cache so the next run re-plans it"""
+    if not os.path.exists(cache_path):
+        return
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return
+    if cache.pop(town, None) is not None:
+        with open(cache_path, "w") as f:
+            json.dump(cache, f, indent=2)
+
+def save_cached_tiles(cache_path, town, bounds, max_results, tiles):
+    """Store a town's tile plan in the JSON cache"""
+    cache = {}
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+    cache[town] = {
+        "bounds": bounds,
+        "max_results": max_results,
+        "planned_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "tiles": tiles,
+    }
+    with open(cache_path, "w") as f:
+        json.dump(cache, f, indent=2)
@@ -0,0 +1,68 @@
+import argparse
+import datetime
+import itertools
+import os
+import time
+from collections import defaultdict
+from multiprocessing import Pool, cpu_count
+
+import pandas as pd
+
+from listing_parser import REQUIRED_FIELDS, build_listing_record, is_complete, parse_listing_html
+from page_archive import iter_pages
+
+def parse_archived_listing(item):
+    """Worker: parse one archived listing page, returning (header, fields)"""
+    header, html = item
+    return header, parse_listing_html(html, header.get("structured"))
+
+def reparse_archive(path, workers=None, batch_size=500):
+    """Rebuild the output rows for a run from its page archive without a browser
+
+    Every archived listing visit becomes a row, like in the live run, even
+    when fields are missing. Returns the rows and how many lack a required field.
+    """
+    workers = workers or cpu_count()
+    listing_counts = defaultdict(int)
+    rows = []
+    incomplete = 0
+
+    pages = iter_pages(path, kind="listing")
+    with Pool(workers) as pool:
+        while True:
+            batch = list(itertools.islice(pages, batch_size))
+            if not batch:
+                break
+            results = pool.map(parse_archived_listing, batch, chunksize=max(1, len(batch) // (workers * 4)))
+            # Rows are built in visit order so "Number of Listings" matches the original run
+            for header, fields in results:
+                if not is_complete(fields):
+                    incomplete += 1
+                fetched_at = datetime.datetime.fromisoformat(header["fetched_at"])
+                rows.append(build_listing_record(fields, header["url"], header["town"], listing_counts, now=fetched_at))
+
+    return rows, incomplete
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a scrape CSV offline from a page archive")
+    parser.add_argument("archive", help="Path to a *_pages.gz archive written by the scraper")
+    parser.add_argument("-o", "--output", help="Output CSV (default: <archive>_reparsed.csv)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Parser processes (default: all cores)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.archive)[0] + "_reparsed.csv"
+    start_time = time.time()
+
+    print(f"📦 Re-parsing {args.archive}...")
+    rows, incomplete = reparse_archive(args.archive, args.workers)
+    if rows:
+        pd.DataFrame(rows).to_csv(output, index=False)
+        print(f"✅ Wrote {len(rows)} listings to {output}")
+    else:
+        print("⚠️ No complete listing pages found in the archive.")
+    if incomplete:
+        print(f"⚠️ {incomplete} listings are missing one of: {', '.join(REQUIRED_FIELDS)}")
+    print(f"⏱️ Re-parsed in {time.time() - start_time:.1f} seconds")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+import sqlite3
+import argparse
+import datetime
+import glob
+import os
+import re
+
+import pandas as pd
+
+# Default location of the history database, next to the CSV exports
+DEFAULT_DB_PATH = os.path.join("scrapes", "scrape_history.db")
+
+# Run exports only, not the _memory/_yield/_reparsed sidecars written next to them
+RUN_CSV_PATTERN = re.compile(r"agents_browser_scrape_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}\.csv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT UNIQUE,
+    scraped_at TEXT NOT NULL,
+    listing_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS listings (
+    listing_url TEXT PRIMARY KEY,
+    agent TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    email TEXT,
+    phone TEXT,
+    website TEXT,
+    brokerage TEXT,
+    street_address TEXT,
+    town TEXT,
+    date_posted TEXT,
+    num_photos TEXT,
+    price TEXT,
+    price_value INTEGER,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS listing_history (
+    listing_url TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    scraped_at TEXT NOT NULL,
+    price TEXT,
+    price_value INTEGER,
+    status TEXT NOT NULL,
+    PRIMARY KEY (listing_url, run_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_listings_agent ON listings(agent);
+CREATE INDEX IF NOT EXISTS idx_listings_town ON listings(town);
+CREATE INDEX IF NOT EXISTS idx_listings_first_seen ON listings(first_seen);
+CREATE INDEX IF NOT EXISTS idx_listings_last_seen ON listings(last_seen);
+CREATE INDEX IF NOT EXISTS idx_history_scraped_at ON listing_history(scraped_at);
+CREATE INDEX IF NOT EXISTS idx_history_url_date ON listing_history(listing_url, scraped_at);
+"""
+
+UPSERT_LISTING = """
+INSERT INTO listings (
+    listing_url, agent, first_name, last_name, email, phone, website, brokerage,
+    street_address, town, date_posted, num_photos, price, price_value, first_seen, last_seen
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(listing_url) DO UPDATE SET
+    agent = CASE WHEN excluded.last_seen >= listings.last_seen THEN excluded.agent ELSE listings.agent END,
+    first_name = CASE WHEN excluded.last_seen >= listings.last_seen THEN excluded.first_name ELSE listings.first_name END,
+    last_name = CASE WHEN excluded.last_seen >= listings.last_seen THEN excluded.last_name ELSE listings.last_name END,
+    email = CASE WHEN excluded.email != '' AND (excluded.last_seen >= listings.last_seen OR listings.email = '')
+        THEN excluded.email ELSE listings.email END,
+    phone = CASE WHEN excluded.phone != '' AND (excluded.last_seen >= listings.last_seen OR listings.phone = '')
+        THEN excluded.phone ELSE listings.phone END,
+    website = CASE WHEN excluded.website != '' AND (excluded.last_seen >= listings.last_seen OR listings.website = '')
+        THEN excluded.website ELSE listings.website END,
+    brokerage = CASE WHEN excluded.last_seen >= listings.last_seen THEN excluded.brokerage ELSE listings.brokerage END,
+    street_address = CASE WHEN excluded.last_seen >= listings.last_seen THEN excluded.street_address ELSE listings.street_address END,
+    town = CASE WHEN excluded.last_seen >= listings.last_seen THEN excluded.town ELSE listings.town END,
+    date_posted = CASE WHEN excluded.last_seen >= listings.last_seen THEN excluded.date_posted ELSE listings.date_posted END,
+    num_photos = CASE WHEN excluded.last_seen >= listings.last_seen THEN excluded.num_photos ELSE listings.num_photos END,
+    price = CASE WHEN excluded.last_seen >= listings.last_seen THEN excluded.price ELSE listings.price END,
+    price_value = CASE WHEN excluded.last_seen >= listings.last_seen THEN excluded.price_value ELSE listings.price_value END,
+    first_seen = MIN(listings.first_seen, excluded.first_seen),
+    last_seen = MAX(listings.last_seen, excluded.last_seen)
+"""
+
+def _status(previous_value, price_value):
+    """History status of an observation given the price seen just before it"""
+    if previous_value is None:
+        return "new"
+    if previous_value == "unknown" or price_value is None or price_value == previous_value:
+        return "unchanged"
+    return "price_change"
+
+def _previous_price(conn, url, scraped_at):
+    """Price value of the history row just before `scraped_at`, None if there is none
+
+    Returns "unknown" when an earlier row exists but has no parsed price.
+    """
+    row = conn.execute(
+        "SELECT price_value FROM listing_history WHERE listing_url = ? AND scraped_at < ? "
+        "ORDER BY scraped_at DESC LIMIT 1",
+        (url, scraped_at)
+    ).fetchone()
+    if row is None:
+        return None
+    return "unknown" if row[0] is None else row[0]
+
+def open_store(db_path=DEFAULT_DB_PATH):
+    """Open (and create if needed) the scrape history database"""
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def parse_price(price):
+    """Convert a displayed price such as '$1,249,000' to an integer, or None"""
+    digits = re.sub(r"[^\d]", "", str(price or ""))
+    return int(digits) if digits else None
+
+def _clean(value):
+    """Normalise a CSV/DataFrame cell to a plain string"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    return str(value).strip()
+
+def upsert_run(conn, rows, scraped_at, source=None):
+    """Upsert one run's listing rows and record their price/status history
+
+    Returns the run_id, or None if this source was already imported.
+    """
+    if source is not None:
+        existing = conn.execute("SELECT run_id FROM runs WHERE source = ?", (source,)).fetchone()
+        if existing:
+            return None
+
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO runs (source, scraped_at, listing_count) VALUES (?, ?, ?)",
+            (source, scraped_at, len(rows))
+        )
+        run_id = cursor.lastrowid
+
+        for row in rows:
+            url = _clean(row.get("Listing URL"))
+            if not url:
+                continue
+
+            first_name = _clean(row.get("First Name"))
+            last_name = _clean(row.get("Last Name"))
+            price = _clean(row.get("Price"))
+            price_value = parse_price(price)
+
+            # Compare with the observation just before this run, so older CSVs can be backfilled
+            status = _status(_previous_price(conn, url, scraped_at), price_value)
+
+            conn.execute(UPSERT_LISTING, (
+                url,
+                f"{first_name} {last_name}".strip(),
+                first_name,
+                last_name,
+                _clean(row.get("Email")),
+                _clean(row.get("Phone")),
+                _clean(row.get("Website")),
+                _clean(row.get("Brokerage")),
+                _clean(row.get("Street Address")),
+                _clean(row.get("Town")),
+                _clean(row.get("Date Posted")),
+                _clean(row.get("Number of Photos")),
+                price,
+                price_value,
+                scraped_at,
+                scraped_at,
+            ))
+            conn.execute(
+                "INSERT OR REPLACE INTO listing_history "
+                "(listing_url, run_id, scraped_at, price, price_value, status) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, run_id, scraped_at, price, price_value, status)
+            )
+
+            # A backfilled run changes the baseline of the observation right after it
+            following = conn.execute(
+                "SELECT run_id, price_value FROM listing_history WHERE listing_url = ? AND scraped_at > ? "
+                "ORDER BY scraped_at LIMIT 1",
+                (url, scraped_at)
+            ).fetchone()
+            if following:
+                conn.execute(
+                    "UPDATE listing_history SET status = ? WHERE listing_url = ? AND run_id = ?",
+                    (_status("unknown" if price_value is None else price_value, following[1]), url, following[0])
+                )
+
+    return run_id
+
+def scraped_at_from_filename(path):
+    """Recover the run timestamp from an agents_browser_scrape_<timestamp>.csv filename"""
+    match = re.search(r"(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})", os.path.basename(path))
+    if match:
+        date, hour, minute, second = match.groups()
+        return f"{date} {hour}:{minute}:{second}"
+    modified = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+    return modified.strftime("%Y-%m-%d %H:%M:%S")
+
+def import_csv(conn, path):
+    """Import a scrape CSV into the store, skipping files already imported"""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return upsert_run(conn, df.to_dict("records"), scraped_at_from_filename(path), source=os.path.abspath(path))
+
+# Prebuilt aggregate queries
+
+def agents_gaining_listings(conn, since):
+    """Agents ranked by the number of listings first seen on or after `since`"""
+    return pd.read_sql_query(
+        """
+        SELECT agent, brokerage, COUNT(*) AS new_listings, MAX(email) AS email, MAX(phone) AS phone
+        FROM listings
+        WHERE first_seen >= ? AND agent != ''
+        GROUP BY agent
+        ORDER BY new_listings DESC, agent
+        """,
+        conn, params=(since,)
+    )
+
+def price_changes(conn, since=None):
+    """Every recorded price change with the previous and new price"""
+    return pd.read_sql_query(
+        """
+        SELECT h.listing_url, l.street_address, l.town, l.agent, h.scraped_at,
+               h.previous_price, h.price, h.price_value - h.previous_value AS change
+        FROM (
+            SELECT listing_url, scraped_at, price, price_value, status,
+                   LAG(price) OVER w AS previous_price,
+                   LAG(price_value) OVER w AS previous_value
+            FROM listing_history
+            WINDOW w AS (PARTITION BY listing_url ORDER BY scraped_at)
+        ) h
+        JOIN listings l ON l.listing_url = h.listing_url
+        WHERE h.status = 'price_change' AND h.scraped_at >= ?
+        ORDER BY h.scraped_at DESC
+        """,
+        conn, params=(since or "",)
+    )
+
+def listings_per_town(conn, since=None):
+    """Active listing and agent counts per town for listings seen on or after `since`"""
+    return pd.read_sql_query(
+        """
+        SELECT town, COUNT(*) AS listings, COUNT(DISTINCT agent) AS agents,
+               CAST(AVG(price_value) AS INTEGER) AS avg_price
+        FROM listings
+        WHERE last_seen >= ?
+        GROUP BY town
+        ORDER BY listings DESC
+        """,
+        conn, params=(since or "",)
+    )
+
+def new_agents(conn, since):
+    """Agents whose first listing in the store was seen on or after `since`"""
+    return pd.read_sql_query(
+        """
+        SELECT agent, MIN(first_seen) AS first_seen, COUNT(*) AS listings,
+               MAX(email) AS email, MAX(phone) AS phone, MAX(brokerage) AS brokerage
+        FROM listings
+        WHERE agent != ''
+        GROUP BY agent
+        HAVING MIN(first_seen) >= ?
+        ORDER BY first_seen DESC
+        """,
+        conn, params=(since,)
+    )
+
+def complete_contact_index(conn):
+    """Return (agents with email and phone on file, their listing URLs, all known listing URLs)"""
+    complete_agents = {
+        row[0] for row in conn.execute(
+            "SELECT agent FROM listings WHERE agent != '' GROUP BY agent "
+            "HAVING MAX(email) != '' AND MAX(phone) != ''"
+        )
+    }
+    contact_urls = set()
+    listing_urls = set()
+    for url, agent in conn.execute("SELECT listing_url, agent FROM listings"):
+        listing_urls.add(url)
+        if agent in complete_agents:
+            contact_urls.add(url)
+    return complete_agents, contact_urls, listing_urls
+
+def known_agent_names(conn):
+    """Every agent name in the store, with or without contact details"""
+    return {row[0] for row in conn.execute("SELECT DISTINCT agent FROM listings WHERE agent != ''")}
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape history store")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Path to the history database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import scrape CSVs into the store")
+    import_parser.add_argument("paths", nargs="*", help="CSV files (default: all scrapes/*.csv)")
+
+    report_parser = subparsers.add_parser("report", help="Print the prebuilt aggregate queries")
+    report_parser.add_argument("--days", type=int, default=7, help="Look-back window in days")
+
+    args = parser.parse_args()
+    conn = open_store(args.db)
+
+    if args.command == "import":
+        paths = args.paths or sorted(
+            path for path in glob.glob(os.path.join("scrapes", "*.csv"))
+            if RUN_CSV_PATTERN.fullmatch(os.path.basename(path))
+        )
+        for path in paths:
+            run_id = import_csv(conn, path)
+            if run_id is None:
+                print(f"⏭️ Already imported {path}")
+            else:
+                print(f"✅ Imported {path} as run {run_id}")
+    else:
+        since = (datetime.datetime.now() - datetime.timedelta(days=args.days)).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"\n📈 Agents gaining listings since {since}")
+        print(agents_gaining_listings(conn, since).to_string(index=False))
+        print(f"\n🆕 New agents since {since}")
+        print(new_agents(conn, since).to_string(index=False))
+        print(f"\n💲 Price changes since {since}")
+        print(price_changes(conn, since).to_string(index=False))
+        print(f"\n🌆 Listings per town since {since}")
+        print(listings_per_town(conn, since).to_string(index=False))
+
+    conn.close()
+
+if __name__ == "__main__":
+    main()
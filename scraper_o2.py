@@ -3,15 +3,29 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 import time
 import pandas as pd
 import re
-import json
 from collections import defaultdict
 import datetime
 import os
 
+try:
+    import psutil
+except ImportError:
+    psutil = None  # Chrome RSS sampling is skipped without psutil
+
+from scrape_store import open_store, upsert_run, complete_contact_index, known_agent_names
+from listing_parser import LISTING_SELECTORS, build_listing_record, map_structured_data, parse_json_blocks, fill_missing_fields
+from listing_http import session_from_driver, fetch_listing
+from page_archive import append_page
+from listing_scheduler import parse_budget, prioritize_listings, summarize_yield
+from region_planner import MAX_REACHABLE_RESULTS, town_bounds, plan_tiles, load_cached_tiles, save_cached_tiles, drop_cached_tiles
+
+# Site root; soak_harness.py points this at a local fake site
+REALTOR_BASE_URL = os.environ.get("REALTOR_BASE_URL", "https://www.realtor.ca")
+
 # Define available towns and their coordinates
 TOWNS = {
     "Milton": {
@@ -132,11 +146,36 @@ def get_pages_per_town():
         except ValueError:
             print("Please enter a valid number")
 
-def get_town_url(town_name):
-    """Generate URL for a specific town (first page)"""
+def get_time_budget():
+    """Prompt user for an optional wall-clock budget for the whole run, in seconds"""
+    while True:
+        budget = input("\nEnter a time budget for the run (e.g. 45m, 1h30m) or press Enter for no limit: ").strip()
+        try:
+            seconds = parse_budget(budget)
+        except ValueError:
+            print("Please enter a duration such as 45m, 90m or 1h30m")
+            continue
+        if seconds is not None and seconds <= 0:
+            print("Please enter a time budget greater than zero")
+            continue
+        return seconds
+
+def get_town_url(town_name, bounds=None, depth=0):
+    """Generate URL for a specific town (first page), optionally restricted to a sub-box"""
     town_data = TOWNS[town_name]
+    if bounds is not None:
+        # Zoom in one level per subdivision so the map keeps the tile's extent
+        town_data = dict(town_data)
+        town_data["lat_min"] = f"{bounds['lat_min']:.5f}"
+        town_data["lat_max"] = f"{bounds['lat_max']:.5f}"
+        town_data["long_min"] = f"{bounds['long_min']:.5f}"
+        town_data["long_max"] = f"{bounds['long_max']:.5f}"
+        town_data["center"] = (
+            f"{(bounds['lat_min'] + bounds['lat_max']) / 2:.6f},"
+            f"{(bounds['long_min'] + bounds['long_max']) / 2:.6f}"
+        )
     base_url = (
-        f"https://www.realtor.ca/map#ZoomLevel=11"
+        f"{REALTOR_BASE_URL}/map#ZoomLevel={11 + depth}"
         f"&Center={town_data['center']}"
         f"&LatitudeMax={town_data['lat_max']}"
         f"&LongitudeMax={town_data['long_max']}"
@@ -264,6 +303,10 @@ def get_listing_urls(driver, max_retries=2):
                     url = link.get_attribute("href")
                     if url and url not in urls:  # Avoid duplicates
                         urls.append(url)
+                        # Keep the card's time on market for scheduling
+                        posted_elements = card.find_elements(By.CSS_SELECTOR, "[class*='TimeOnRealtor']")
+                        if posted_elements:
+                            listing_card_posted[url] = posted_elements[0].text.strip()
                 except Exception as e:
                     # Continue with next card if one fails
                     print(f"⚠️ Error getting URL from card: {str(e)[:100]}...")
@@ -286,6 +329,45 @@ def get_listing_urls(driver, max_retries=2):
     
     return urls
 
+def load_map_search(driver, url, timeout=10):
+    """Load a map search as a fresh document and wait for it to be ready
+
+    Map URLs only differ in their hash, so driver.get() alone keeps the previous
+    search's cards and count on the page; reload like switch_to_town does.
+    """
+    driver.get(url)
+    # The marker disappears once the reloaded document replaces the old one
+    driver.execute_script("window.__staleMapPage = true; location.reload(true);")
+    try:
+        WebDriverWait(driver, timeout, ignored_exceptions=(WebDriverException,)).until(
+            lambda d: not d.execute_script("return window.__staleMapPage === true;")
+            and d.execute_script("return document.readyState") == "complete"
+        )
+    except TimeoutException:
+        return False
+    time.sleep(0.2)
+    return True
+
+def get_result_count(driver):
+    """Read the total number of results reported for the current map search, or None"""
+    for selector in ("#mapResultsNumVal", ".mapResultsNum", ".resultsPaginationCon", "#ListViewPagination_Top"):
+        try:
+            text = driver.find_element(By.CSS_SELECTOR, selector).text
+        except NoSuchElementException:
+            continue
+        match = re.search(r"of\s+([\d,]+)", text) or re.search(r"([\d,]+)\s+(?:results|listings)", text, re.I)
+        if not match:
+            match = re.fullmatch(r"\s*([\d,]+)\s*", text)
+        if match:
+            return int(match.group(1).replace(",", ""))
+
+    # Fall back to the number of result pages when only that is shown
+    try:
+        pages_text = driver.find_element(By.CSS_SELECTOR, "span.paginationTotalPagesNum").text
+        return int(pages_text.replace(",", "").strip()) * 12
+    except (NoSuchElementException, ValueError):
+        return None
+
 def return_to_map_view(driver, map_url, max_retries=3):
     """Safely return to map view with retries"""
     for retry in range(max_retries):
@@ -437,8 +519,43 @@ def setup_browser():
     print("🔄 Setting up browser...")
     driver = uc.Chrome()
     driver.maximize_window()
+    enable_performance_metrics(driver)
     return driver
 
+def enable_performance_metrics(driver):
+    """Enable CDP performance metrics in the current tab so its JS heap can be sampled"""
+    try:
+        driver.execute_cdp_cmd("Performance.enable", {})
+    except Exception as e:
+        print(f"⚠️ Could not enable performance metrics: {str(e)[:100]}...")
+
+def get_browser_rss_mb(driver):
+    """Total resident memory of the Chrome process tree in MB, or None if unavailable"""
+    if psutil is None:
+        return None
+    try:
+        root = psutil.Process(driver.browser_pid)
+        total = 0
+        for process in [root] + root.children(recursive=True):
+            try:
+                total += process.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total / (1024 * 1024)
+    except (psutil.Error, AttributeError, TypeError):
+        return None
+
+def get_js_heap_mb(driver):
+    """Used JS heap of the current page in MB from CDP Performance.getMetrics, or None"""
+    try:
+        metrics = driver.execute_cdp_cmd("Performance.getMetrics", {}).get("metrics", [])
+        for metric in metrics:
+            if metric.get("name") == "JSHeapUsedSize":
+                return metric.get("value", 0) / (1024 * 1024)
+    except Exception:
+        pass
+    return None
+
 # Initialize driver
 driver = setup_browser()
 
@@ -446,9 +563,35 @@ driver = setup_browser()
 consecutive_listing_errors = 0
 max_consecutive_errors = 5  # Restart browser after this many consecutive errors
 
+# Proactive browser recycling based on memory usage
+memory_check_interval = 10  # Sample browser memory every N page loads across the whole run
+max_browser_rss_mb = 2500  # Recycle when the Chrome process tree exceeds this RSS
+max_js_heap_mb = 800  # Recycle when the page's used JS heap exceeds this size
+memory_samples = []
+browser_restarts = defaultdict(int)  # Restart counts by reason
+memory_check = {"pages": 0, "pending_reason": None}  # Run-wide page counter and deferred recycle reason
+
+# Multi-tab mode: load upcoming listings in other tabs while extracting from the current one
+tabs_per_browser = int(os.environ.get("SCRAPER_TABS_PER_BROWSER", "1"))  # Listing tabs per browser (1 = single-tab mode)
+listing_tab_urls = {}  # Window handle -> listing URL currently loading in that tab
+listing_request_delay = 1  # Seconds to wait before each listing request, on every path
+
+# Plain-HTTP fast path for listing pages, falling back to the browser when blocked or incomplete.
+# Off by default: it sends the live browser's cookies from a non-browser client.
+use_http_fast_path = os.environ.get("SCRAPER_HTTP_FAST_PATH", "0") == "1"
+fast_path_min_attempts = 20  # Attempts before judging the hit rate
+fast_path_min_hit_rate = 0.1  # Disable the fast path for the run below this hit rate
+# The two modes are exclusive: tabs can't prefetch listings the fast path may still serve
+if use_http_fast_path and tabs_per_browser > 1:
+    print(f"⚠️ HTTP fast path is disabled in multi-tab mode ({tabs_per_browser} tabs)")
+    use_http_fast_path = False
+http_fast_path = {"enabled": use_http_fast_path, "session": None}
+fast_path_stats = {"attempts": 0, "hits": 0, "hit_seconds": 0.0, "browser_listings": 0, "browser_seconds": 0.0}
+fast_path_fallbacks = defaultdict(int)  # Fallback counts by reason
+
 # Go to Realtor.ca
 print("Opening Realtor.ca...")
-driver.get("https://www.realtor.ca")
+driver.get(REALTOR_BASE_URL)
 
 # Get town selection from user
 selected_towns = select_towns()
@@ -458,6 +601,11 @@ print(f"\nSearching in: {', '.join(selected_towns)}")
 max_pages = get_pages_per_town()
 print(f"Will scrape {max_pages} pages per town")
 
+# Get optional time budget for the run
+time_budget = get_time_budget()
+if time_budget:
+    print(f"Will stop after {time_budget / 60:.0f} minutes, scraping the most valuable listings first")
+
 # Remove manual search prompts and directly navigate to first town
 first_town = selected_towns[0]
 first_town_url = get_town_url(first_town)
@@ -476,60 +624,93 @@ except TimeoutException:
 # Start timing
 start_time = time.time()
 
+# Deadline-driven scheduling: each town gets an equal share of the remaining budget
+schedule = {
+    "run_deadline": start_time + time_budget if time_budget else None,
+    "collect_deadline": None,  # URL collection may use half of the town's share
+    "listing_deadline": None
+}
+listing_card_posted = {}  # Listing URL -> time on market shown on its map card
+yield_samples = []
+new_agents_found = set()
+
 agent_data = []
 listing_counts = defaultdict(int)
+listing_throughput = {"listings": 0, "seconds": 0.0}
+field_source_stats = defaultdict(int)  # "<field>:<structured|dom|missing>" counts per listing
 
 # Setup timestamped filename
-filename = os.path.join(scrapes_dir, f"agents_browser_scrape_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv")
-
-# Helper function to parse relative time
-from dateutil.relativedelta import relativedelta
-from dateutil.parser import parse as date_parse
-
-def parse_posted_time(relative_time):
-    now = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
-    number = int(re.search(r'\d+', relative_time).group()) if re.search(r'\d+', relative_time) else 0
-    if 'hour' in relative_time:
-        return (now - datetime.timedelta(hours=number)).strftime('%Y-%m-%d %H:00')
-    elif 'minute' in relative_time:
-        return (now - datetime.timedelta(minutes=number)).strftime('%Y-%m-%d %H:00')
-    elif 'day' in relative_time:
-        return (now - datetime.timedelta(days=number)).strftime('%Y-%m-%d %H:00')
-    elif 'week' in relative_time:
-        return (now - datetime.timedelta(weeks=number)).strftime('%Y-%m-%d %H:00')
-    elif 'month' in relative_time:
-        return (now - relativedelta(months=number)).strftime('%Y-%m-%d %H:00')
-    elif 'year' in relative_time:
-        return (now - relativedelta(years=number)).strftime('%Y-%m-%d %H:00')
-    return now.strftime('%Y-%m-%d %H:00')
-
-def extract_json_ld_data(driver):
+run_started_at = datetime.datetime.now()
+filename = os.path.join(scrapes_dir, f"agents_browser_scrape_{run_started_at.strftime('%Y-%m-%d_%H-%M-%S')}.csv")
+
+# Indexed history database that every run is upserted into
+history_db_path = os.path.join(scrapes_dir, "scrape_history.db")
+
+# Adaptive subdivision of dense towns beyond the pagination cap
+subdivide_dense_towns = True  # Only applies when scraping the full 50 pages per town
+max_tile_depth = 4  # Maximum number of quadrant splits
+tile_cache_path = os.path.join(scrapes_dir, "tile_cache.json")
+tile_cache_max_age_days = 30  # Re-plan tiles after this many days
+
+# Listings whose agent we already have full contact details for, used to prioritize new contacts,
+# and every agent in the store, used to count new agents in the yield curve
+try:
+    conn = open_store(history_db_path)
+    _, known_contact_urls, known_listing_urls = complete_contact_index(conn)
+    known_agents = known_agent_names(conn)
+    conn.close()
+except Exception as e:
+    print(f"⚠️ Could not load agent index from {history_db_path}: {str(e)[:100]}...")
+    known_contact_urls, known_listing_urls, known_agents = set(), set(), set()
+
+# Compressed archive of raw map and listing pages; rebuild a run offline with reparse_archive.py
+archive_pages = False
+archive_filename = filename.replace(".csv", "_pages.gz")
+
+def extract_structured_data(driver):
+    """Read the JSON texts of every JSON-LD block and any embedded application state in one call"""
     try:
-        # Find the JSON-LD script tag
-        script = driver.find_element(By.CSS_SELECTOR, 'script[type="application/ld+json"]')
-        # Parse the JSON data
-        json_data = json.loads(script.get_attribute('innerHTML'))
-        
-        # Extract location hierarchy from BreadcrumbList
-        if json_data and isinstance(json_data, dict) and json_data.get('@type') == 'BreadcrumbList':
-            locations = []
-            item_list = json_data.get('itemListElement', [])
-            if isinstance(item_list, list):
-                for item in item_list:
-                    if isinstance(item, dict) and item.get('@type') == 'ListItem':
-                        name = item.get('name')
-                        if name:
-                            locations.append(name)
-            return locations
+        texts = driver.execute_script("""
+            var texts = [];
+            document.querySelectorAll('script[type="application/ld+json"], script[type="application/json"], script#__NEXT_DATA__')
+                .forEach(function (script) { texts.push(script.textContent); });
+            ['__NEXT_DATA__', '__INITIAL_STATE__', '__PRELOADED_STATE__', '__APOLLO_STATE__'].forEach(function (name) {
+                try { if (window[name]) { texts.push(JSON.stringify(window[name])); } } catch (e) {}
+            });
+            return texts;
+        """)
+        return texts or []
     except Exception as e:
-        print(f"Error extracting JSON-LD data: {e}")
+        print(f"⚠️ Error extracting structured data: {str(e)[:100]}...")
         return []
 
+def read_dom_field(driver, field):
+    """Read one LISTING_SELECTORS field from the DOM, or "" if it isn't on the page"""
+    tag, match_attr, match_value, read_attr = LISTING_SELECTORS[field]
+    selector = (tag or "") + (f"#{match_value}" if match_attr == "id" else f".{match_value}")
+    try:
+        if field == "price":
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+            )
+        element = driver.find_element(By.CSS_SELECTOR, selector)
+        return element.get_attribute(read_attr) if read_attr else element.text
+    except:
+        return ""
+
+def record_field_sources(sources):
+    """Count where each field came from and whether structured data covered everything"""
+    field_source_stats["listings"] += 1
+    for field in LISTING_SELECTORS:
+        field_source_stats[f"{field}:{sources.get(field, 'missing')}"] += 1
+    if all(sources.get(field) == "structured" for field in LISTING_SELECTORS):
+        field_source_stats["structured_only"] += 1
+
 def scrape_listing(driver, url, town, retry_count=0, max_retries=2):
     """Scrape data from a single listing URL with retry capability"""
     try:
-        # Add a small random delay between 1-3 seconds before visiting listing
-        time.sleep(1 + (1 * retry_count))
+        # Add a small delay before visiting listing, longer on retries
+        time.sleep(listing_request_delay + (1 * retry_count))
         
         driver.get(url)
         # Use explicit wait instead of sleep
@@ -544,91 +725,321 @@ def scrape_listing(driver, url, town, retry_count=0, max_retries=2):
             else:
                 return None
 
-        try:
-            agent_name = driver.find_element(By.CLASS_NAME, "realtorCardName").text
-        except:
-            agent_name = ""
+        return extract_listing(driver, url, town)
+    except Exception as e:
+        print(f"❌ Error scraping listing {url}: {e}")
+        return None
 
-        try:
-            phone = driver.find_element(By.CLASS_NAME, "realtorCardContactNumber").text
-        except:
-            phone = ""
+def archive_page(url, html, kind, town, structured=None):
+    """Append a raw page (and the structured data read from it) to the run's archive when archiving is enabled"""
+    if not archive_pages:
+        return
+    try:
+        append_page(archive_filename, url, html, kind, town, structured=structured)
+    except Exception as e:
+        print(f"⚠️ Error archiving page {url}: {str(e)[:100]}...")
 
-        try:
-            email = driver.find_element(By.CLASS_NAME, "agent-email").get_attribute("href").replace("mailto:", "")
-        except:
-            email = ""
+def extract_listing(driver, url, town):
+    """Extract the output fields from the listing page loaded in the current tab"""
+    # Structured data first, DOM selectors only for whatever it lacks
+    structured = extract_structured_data(driver)
+    fields = map_structured_data(parse_json_blocks(structured))
+    sources = fill_missing_fields(fields, lambda field: read_dom_field(driver, field))
+    record_field_sources(sources)
 
-        try:
-            website_elem = driver.find_element(By.CSS_SELECTOR, "a.realtorCardWebsite")
-            website = website_elem.get_attribute("href")
-        except:
-            website = ""
+    # Archive after extraction so the page includes anything the selectors waited for
+    if archive_pages:
+        archive_page(url, driver.page_source, "listing", town, structured)
 
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "listingPrice"))
-            )
-            price_wrapper = driver.find_element(By.ID, "listingPrice")
-            price = price_wrapper.text
-        except:
-            price = ""
+    return build_listing_record(fields, url, town, listing_counts)
 
-        try:
-            address = driver.find_element(By.ID, "listingAddress").text.replace("\n", " ")
-        except:
-            address = ""
+def get_listing_tabs(driver, count):
+    """Return `count` window handles, opening new tabs as needed"""
+    handles = list(driver.window_handles)
+    # Forget assignments for tabs that were closed or belong to a previous browser
+    for handle in list(listing_tab_urls):
+        if handle not in handles:
+            del listing_tab_urls[handle]
 
-        try:
-            posted_raw = driver.find_element(By.CLASS_NAME, "ConditionallyTimeOnRealtorCon").text.strip()
-            posted = parse_posted_time(posted_raw)
-        except:
-            posted = ""
+    while len(handles) < count:
+        driver.switch_to.new_window('tab')
+        # CDP domains are per tab, and memory samples may be taken from any of them
+        enable_performance_metrics(driver)
+        handles = list(driver.window_handles)
+    return handles[:count]
 
-        # Clean the street address
-        cleaned_address = address.split(',')[0].strip().title() if address else ""
+def start_listing_load(driver, handle, url):
+    """Start loading a listing in a tab without waiting for it to finish"""
+    # Same pacing as a single-tab load, so extra tabs overlap latency without raising the request rate
+    time.sleep(listing_request_delay)
+    driver.switch_to.window(handle)
+    # The marker disappears once the new document replaces the old one
+    driver.execute_script("window.__staleListingPage = true; window.location.href = arguments[0];", url)
+    listing_tab_urls[handle] = url
 
-        try:
-            photo_text = driver.find_element(By.ID, "btnPhotoCount").text
-            num_photos = photo_text.replace("+", "").strip()
-        except:
-            num_photos = ""
+def prefetch_listings(driver, urls):
+    """Assign upcoming listing URLs to idle tabs so they load in the background"""
+    handles = get_listing_tabs(driver, tabs_per_browser)
+    loading = set(listing_tab_urls.values())
+    idle = [handle for handle in handles if handle not in listing_tab_urls]
+    for url in urls:
+        if not idle:
+            break
+        if url not in loading:
+            start_listing_load(driver, idle.pop(0), url)
+
+def scrape_listing_in_tabs(driver, urls, index, town, timeout=8):
+    """Scrape urls[index] from its prefetched tab while the next listings load in the other tabs"""
+    url = urls[index]
+    prefetch_listings(driver, urls[index:index + tabs_per_browser])
+    handle = next((h for h, loading_url in listing_tab_urls.items() if loading_url == url), None)
+    if handle is None:
+        return scrape_listing(driver, url, town)
 
-        # Get brokerage name
+    try:
+        driver.switch_to.window(handle)
         try:
-            brokerage = driver.find_element(By.CSS_SELECTOR, "div.officeCardName").text.strip()
-        except:
-            brokerage = ""
-
-        first_name = agent_name.split()[0].capitalize() if agent_name else ""
-        last_name = agent_name.split()[-1].capitalize() if agent_name and len(agent_name.split()) > 1 else ""
-        full_name_key = f"{first_name} {last_name}"
-        listing_counts[full_name_key] += 1
-
-        return {
-            "First Name": first_name,
-            "Last Name": last_name,
-            "Email": email,
-            "Phone": phone,
-            "Website": website,
-            "Price": price,
-            "Number of Listings": listing_counts[full_name_key],
-            "Number of Photos": num_photos,
-            "Street Address": cleaned_address,
-            "Date Posted": posted,
-            "Listing URL": url,
-            "Town": town,
-            "Brokerage": brokerage
-        }
+            WebDriverWait(driver, timeout).until(
+                lambda d: not d.execute_script("return window.__staleListingPage === true;")
+                and d.find_elements(By.ID, "listingAddress")
+            )
+        except TimeoutException:
+            # Fall back to the regular single-tab path with its retries
+            print(f"⚠️ Timeout waiting for listing in background tab. Falling back to direct load...")
+            del listing_tab_urls[handle]
+            return scrape_listing(driver, url, town, retry_count=1)
+
+        listing_tab_urls.pop(handle, None)
+        listing_data = extract_listing(driver, url, town)
     except Exception as e:
+        listing_tab_urls.pop(handle, None)
         print(f"❌ Error scraping listing {url}: {e}")
         return None
 
+    # Refill the freed tab before the caller moves on
+    try:
+        prefetch_listings(driver, urls[index + 1:index + 1 + tabs_per_browser])
+    except Exception as e:
+        print(f"⚠️ Error prefetching next listings: {str(e)[:100]}...")
+    return listing_data
+
+def scrape_listing_fast(driver, url, town):
+    """Try to scrape a listing over pooled HTTP using the browser's session; None means fall back"""
+    if http_fast_path["session"] is None:
+        http_fast_path["session"] = session_from_driver(driver)
+
+    started = time.time()
+    time.sleep(listing_request_delay)
+    fast_path_stats["attempts"] += 1
+    fields, html, reason = fetch_listing(http_fast_path["session"], url)
+    if fields is None:
+        fast_path_fallbacks[reason.split(":")[0]] += 1
+        print(f"↪️ HTTP fast path fell back to browser ({reason})")
+
+        # Stop paying for requests that keep getting blocked
+        attempts = fast_path_stats["attempts"]
+        if attempts >= fast_path_min_attempts and fast_path_stats["hits"] / attempts < fast_path_min_hit_rate:
+            print(f"⚠️ HTTP fast path hit rate below {fast_path_min_hit_rate:.0%} after {attempts} attempts. Disabling it for this run.")
+            http_fast_path["enabled"] = False
+        return None
+
+    fast_path_stats["hits"] += 1
+    fast_path_stats["hit_seconds"] += time.time() - started
+    record_field_sources(fields["sources"])
+    archive_page(url, html, "listing", town)
+    return build_listing_record(fields, url, town, listing_counts)
+
+def save_progress():
+    """Write the data collected so far to the run's CSV"""
+    if agent_data:
+        df = pd.DataFrame(agent_data)
+        df.to_csv(filename, index=False)
+
+def sample_browser_memory(driver, town):
+    """Record a memory sample and return a reason string if the browser should be recycled"""
+    rss_mb = get_browser_rss_mb(driver)
+    js_heap_mb = get_js_heap_mb(driver)
+    memory_samples.append({
+        "Timestamp": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "Elapsed Seconds": round(time.time() - start_time, 1),
+        "Town": town,
+        "Listings Scraped": len(agent_data),
+        "Chrome RSS MB": round(rss_mb, 1) if rss_mb is not None else "",
+        "JS Heap MB": round(js_heap_mb, 1) if js_heap_mb is not None else "",
+        "Recycled": False
+    })
+
+    rss_text = f"{rss_mb:.0f} MB" if rss_mb is not None else "n/a"
+    heap_text = f"{js_heap_mb:.0f} MB" if js_heap_mb is not None else "n/a"
+    print(f"🧠 Browser memory: RSS {rss_text}, JS heap {heap_text}")
+
+    if rss_mb is not None and rss_mb > max_browser_rss_mb:
+        return f"Chrome RSS {rss_mb:.0f} MB > {max_browser_rss_mb} MB"
+    if js_heap_mb is not None and js_heap_mb > max_js_heap_mb:
+        return f"JS heap {js_heap_mb:.0f} MB > {max_js_heap_mb} MB"
+    return None
+
+def count_page_for_memory_check(driver, town):
+    """Count a page load run-wide and sample browser memory every memory_check_interval pages
+
+    Map pages can't be left mid-pagination, so a crossed threshold is only
+    noted here and acted on by recycle_if_needed() between listings or towns.
+    """
+    memory_check["pages"] += 1
+    if memory_check["pages"] % memory_check_interval == 0:
+        recycle_reason = sample_browser_memory(driver, town)
+        if recycle_reason:
+            memory_check["pending_reason"] = recycle_reason
+
+def recycle_if_needed(driver, town):
+    """Recycle the browser if a memory sample crossed a threshold since the last restart"""
+    recycle_reason = memory_check["pending_reason"]
+    if not recycle_reason:
+        return driver
+    print(f"♻️ Recycling browser proactively: {recycle_reason}")
+    memory_samples[-1]["Recycled"] = True
+    return restart_browser(driver, town, "memory")
+
+def restart_browser(driver, town, reason):
+    """Save progress, replace the browser with a fresh one and return to the town's first page"""
+    browser_restarts[reason] += 1
+    memory_check["pending_reason"] = None
+    try:
+        driver.quit()
+    except:
+        print("⚠️ Error while closing browser")
+
+    # Save data so far
+    if agent_data:
+        save_progress()
+        print(f"💾 Saved data before browser restart")
+
+    # Create new browser instance
+    listing_tab_urls.clear()
+    http_fast_path["session"] = None
+    driver = setup_browser()
+
+    # Navigate back to the first page of current town
+    print(f"Navigating to {town} after browser restart...")
+    driver.get(get_town_url(town))
+    wait_for_page_ready(driver)
+    return driver
+
+def collect_listing_urls(driver, town):
+    """Collect listing URLs from the loaded map search, paging through up to max_pages
+
+    Returns (urls, whether a next page was still available after max_pages).
+    """
+    listing_urls = []
+    page_number = 1
+    consecutive_empty_pages = 0
+    max_consecutive_empty = 3
+
+    while page_number <= max_pages:
+        if schedule["collect_deadline"] and time.time() >= schedule["collect_deadline"]:
+            print(f"⏰ URL collection time for {town} used up. Moving on to listings.")
+            break
+        try:
+            print(f"Collecting URLs from page {page_number} in {town}...")
+            
+            # Wait for listings to appear
+            if not wait_for_listings(driver):
+                print(f"⚠️ No listings found on page {page_number} in {town}")
+                consecutive_empty_pages += 1
+                if consecutive_empty_pages >= max_consecutive_empty:
+                    print(f"⚠️ No listings found for {consecutive_empty_pages} consecutive pages in {town}. Moving to next town.")
+                    break
+                
+                # Try to navigate to next page even if no listings found
+                if not navigate_to_next_page(driver):
+                    print(f"⚠️ Cannot navigate to next page. Moving to next town.")
+                    break
+                page_number += 1
+                continue
+
+            # Get URLs from current page
+            page_urls = get_listing_urls(driver)
+            count_page_for_memory_check(driver, town)
+            if archive_pages:
+                archive_page(driver.current_url, driver.page_source, "map", town)
+            if page_urls:
+                listing_urls.extend(page_urls)
+                print(f"✅ Found {len(page_urls)} URLs on page {page_number}")
+                consecutive_empty_pages = 0
+            else:
+                consecutive_empty_pages += 1
+                if consecutive_empty_pages >= max_consecutive_empty:
+                    print(f"⚠️ No listings found for {consecutive_empty_pages} consecutive pages in {town}. Moving to next town.")
+                    break
+
+            # Navigate to next page with retry logic
+            if not navigate_to_next_page(driver):
+                print(f"⚠️ End of pages for {town}. Moving to next town.")
+                break
+            
+            # Add delay between page switches
+            time.sleep(2)
+            
+            # Increment page number
+            page_number += 1
+            
+        except Exception as e:
+            print(f"❌ Error collecting URLs on page {page_number}: {str(e)[:100]}...")
+            # Try to move to next page or town
+            try:
+                if not navigate_to_next_page(driver):
+                    print(f"⚠️ Cannot continue with {town}. Moving to next town.")
+                    break
+                page_number += 1
+            except:
+                print(f"⚠️ Cannot recover. Moving to next town.")
+                break
+
+    return listing_urls, page_number > max_pages
+
+def get_town_tiles(driver, town):
+    """Return (sub-boxes that cover a town within the pagination cap, whether they came from the cache)"""
+    bounds = town_bounds(TOWNS[town])
+    tiles = load_cached_tiles(tile_cache_path, town, bounds, MAX_REACHABLE_RESULTS, tile_cache_max_age_days)
+    if tiles is not None:
+        print(f"🧩 Using {len(tiles)} cached tiles for {town}")
+        return tiles, True
+
+    def count_tile_results(tile_bounds, depth):
+        # Planning counts against the town's collection time; past it, stop splitting
+        if schedule["collect_deadline"] and time.time() >= schedule["collect_deadline"]:
+            return None
+        load_map_search(driver, get_town_url(town, tile_bounds, depth))
+        count_page_for_memory_check(driver, town)
+        if not wait_for_listings(driver, max_retries=1):
+            # No cards may mean an empty box or a failed load; only an explicit 0 is trusted
+            return 0 if get_result_count(driver) == 0 else None
+        return get_result_count(driver)
+
+    print(f"🧩 Planning tiles for {town}...")
+    tiles = plan_tiles(bounds, count_tile_results, MAX_REACHABLE_RESULTS, max_tile_depth)
+    if any(tile["results"] is None for tile in tiles):
+        print(f"⚠️ Some tile counts for {town} could not be read. Not caching this plan")
+    else:
+        save_cached_tiles(tile_cache_path, town, bounds, MAX_REACHABLE_RESULTS, tiles)
+    print(f"🧩 Planned {len(tiles)} tiles for {town}")
+    return tiles, False
+
 try:
     for town_index, town in enumerate(selected_towns):
         print(f"\n{'='*50}")
         print(f"🌆 TOWN {town_index+1}/{len(selected_towns)}: {town}")
         print(f"{'='*50}")
+
+        if schedule["run_deadline"]:
+            remaining = schedule["run_deadline"] - time.time()
+            if remaining <= 0:
+                print(f"⏰ Time budget used up. Skipping remaining towns.")
+                break
+            town_share = remaining / (len(selected_towns) - town_index)
+            schedule["collect_deadline"] = time.time() + town_share / 2
+            schedule["listing_deadline"] = time.time() + town_share
+            print(f"⏰ {town_share / 60:.1f} minutes allotted to {town}")
         
         # Before switching to a new town, clear browser state
         if town_index > 0:  # Only for second town onwards
@@ -649,6 +1060,9 @@ try:
             except Exception as e:
                 print(f"⚠️ Error clearing browser state: {str(e)[:100]}...")
         
+        # Act on a memory threshold crossed while collecting the previous town's URLs
+        driver = recycle_if_needed(driver, town)
+
         # Switch to the current town
         if not switch_to_town(driver, town):
             print(f"❌ Failed to switch to {town} after multiple attempts. Moving to next town.")
@@ -687,79 +1101,98 @@ try:
         # First, collect all URLs for the town
         print(f"\n📥 Collecting all listing URLs for {town}...")
         all_listing_urls = []
-        page_number = 1
-        consecutive_empty_pages = 0
-        max_consecutive_empty = 3
+        seen_urls = set()
 
-        while page_number <= max_pages:
+        # Dense towns are split into tiles that each fit within the pagination cap
+        town_tiles, tiles_cached = [None], False
+        if subdivide_dense_towns and max_pages >= 50:
             try:
-                print(f"Collecting URLs from page {page_number} in {town}...")
-                
-                # Wait for listings to appear
-                if not wait_for_listings(driver):
-                    print(f"⚠️ No listings found on page {page_number} in {town}")
-                    consecutive_empty_pages += 1
-                    if consecutive_empty_pages >= max_consecutive_empty:
-                        print(f"⚠️ No listings found for {consecutive_empty_pages} consecutive pages in {town}. Moving to next town.")
-                        break
-                    
-                    # Try to navigate to next page even if no listings found
-                    if not navigate_to_next_page(driver):
-                        print(f"⚠️ Cannot navigate to next page. Moving to next town.")
-                        break
-                    page_number += 1
-                    continue
-
-                # Get URLs from current page
-                page_urls = get_listing_urls(driver)
-                if page_urls:
-                    all_listing_urls.extend(page_urls)
-                    print(f"✅ Found {len(page_urls)} URLs on page {page_number}")
-                    consecutive_empty_pages = 0
-                else:
-                    consecutive_empty_pages += 1
-                    if consecutive_empty_pages >= max_consecutive_empty:
-                        print(f"⚠️ No listings found for {consecutive_empty_pages} consecutive pages in {town}. Moving to next town.")
-                        break
-
-                # Navigate to next page with retry logic
-                if not navigate_to_next_page(driver):
-                    print(f"⚠️ End of pages for {town}. Moving to next town.")
-                    break
-                
-                # Add delay between page switches
-                time.sleep(2)
-                
-                # Increment page number
-                page_number += 1
-                
+                town_tiles, tiles_cached = get_town_tiles(driver, town)
             except Exception as e:
-                print(f"❌ Error collecting URLs on page {page_number}: {str(e)[:100]}...")
-                # Try to move to next page or town
+                print(f"⚠️ Tile planning failed for {town}: {str(e)[:100]}... Scraping the whole town instead")
                 try:
-                    if not navigate_to_next_page(driver):
-                        print(f"⚠️ Cannot continue with {town}. Moving to next town.")
-                        break
-                    page_number += 1
-                except:
-                    print(f"⚠️ Cannot recover. Moving to next town.")
-                    break
+                    load_map_search(driver, get_town_url(town))
+                except Exception as e:
+                    print(f"⚠️ Error returning to {town}: {str(e)[:100]}...")
+
+        for tile_index, tile in enumerate(town_tiles, 1):
+            if tile is not None:
+                # A cached count can be weeks old, so only a freshly read 0 skips a tile
+                if tile["results"] == 0 and not tiles_cached:
+                    continue
+                results = "unknown" if tile["results"] is None else tile["results"]
+                print(f"\n🧩 Tile {tile_index}/{len(town_tiles)} in {town} ({results} results)")
+                try:
+                    load_map_search(driver, get_town_url(town, tile, tile["depth"]))
+                except Exception as e:
+                    print(f"⚠️ Error loading tile {tile_index} in {town}: {str(e)[:100]}... Skipping it")
+                    continue
+
+            tile_urls, reached_page_cap = collect_listing_urls(driver, town)
+            if tile is not None and tiles_cached and reached_page_cap:
+                print(f"⚠️ Tile {tile_index} in {town} now has more results than {max_pages} pages. Re-planning next run")
+                drop_cached_tiles(tile_cache_path, town)
+
+            # Tiles share edges, so skip listings already collected from a neighbour
+            for url in tile_urls:
+                if url not in seen_urls:
+                    seen_urls.add(url)
+                    all_listing_urls.append(url)
 
         print(f"\n📊 Collected {len(all_listing_urls)} total URLs for {town}")
+
+        # With a time budget, visit the listings most likely to yield new agents first
+        if schedule["run_deadline"] and all_listing_urls:
+            all_listing_urls, deferred = prioritize_listings(
+                all_listing_urls, listing_card_posted, known_contact_urls, known_listing_urls
+            )
+            print(f"📋 Prioritized {len(all_listing_urls)} listings, {deferred} low-value listings deferred to the end")
+            # Collection may have finished early, so hand its unused time to the listings
+            schedule["listing_deadline"] = max(
+                schedule["listing_deadline"],
+                time.time() + (schedule["run_deadline"] - time.time()) / (len(selected_towns) - town_index)
+            )
         
         # Now process all collected URLs
         if all_listing_urls:
             print(f"\n🔄 Processing {len(all_listing_urls)} listings for {town}...")
             consecutive_listing_errors = 0
+            listing_phase_start = time.time()
+            listings_processed = 0
+            # Cookies were cleared when switching towns, so re-export them from the browser
+            http_fast_path["session"] = None
 
             for i, url in enumerate(all_listing_urls, 1):
+                if schedule["listing_deadline"] and time.time() >= min(schedule["listing_deadline"], schedule["run_deadline"]):
+                    print(f"⏰ Time allotted to {town} used up. Skipping {len(all_listing_urls) - i + 1} remaining listings.")
+                    break
+                listings_processed += 1
                 try:
                     print(f"→ Processing listing {i}/{len(all_listing_urls)}")
                     
-                    listing_data = scrape_listing(driver, url, town)
+                    listing_data = None
+                    if http_fast_path["enabled"]:
+                        listing_data = scrape_listing_fast(driver, url, town)
+
+                    if listing_data is None:
+                        browser_started = time.time()
+                        if tabs_per_browser > 1:
+                            listing_data = scrape_listing_in_tabs(driver, all_listing_urls, i - 1, town)
+                        else:
+                            listing_data = scrape_listing(driver, url, town)
+                        fast_path_stats["browser_listings"] += 1
+                        fast_path_stats["browser_seconds"] += time.time() - browser_started
                     
                     if listing_data:
                         agent_data.append(listing_data)
+                        agent_key = f"{listing_data['First Name']} {listing_data['Last Name']}".strip()
+                        if agent_key and agent_key not in known_agents:
+                            new_agents_found.add(agent_key)
+                        yield_samples.append({
+                            "Elapsed Minutes": round((time.time() - start_time) / 60, 2),
+                            "Listings Scraped": len(agent_data),
+                            "New Agents": len(new_agents_found)
+                        })
                         print(f"✅ Successfully scraped listing {i}/{len(all_listing_urls)} in {town} - {listing_data.get('Street Address', 'No address')}")
                         consecutive_listing_errors = 0  # Reset error counter on success
                     else:
@@ -769,32 +1202,19 @@ try:
                     # Check if we need to restart the browser due to too many errors
                     if consecutive_listing_errors >= max_consecutive_errors:
                         print(f"🔄 Too many consecutive listing failures ({consecutive_listing_errors}). Restarting browser...")
-                        try:
-                            driver.quit()
-                        except:
-                            print("⚠️ Error while closing browser")
-                            
-                        # Save data so far
-                        if agent_data:
-                            df = pd.DataFrame(agent_data)
-                            df.to_csv(filename, index=False)
-                            print(f"💾 Saved data before browser restart")
-                        
-                        # Create new browser instance
-                        driver = setup_browser()
-                        
-                        # Navigate back to the first page of current town
-                        print(f"Navigating to {town} after browser restart...")
-                        driver.get(get_town_url(town))
-                        wait_for_page_ready(driver)
+                        driver = restart_browser(driver, town, "errors")
                         
                         # Reset error counter
                         consecutive_listing_errors = 0
                     
+                    # Recycle the browser between listings before memory growth hurts throughput
+                    else:
+                        count_page_for_memory_check(driver, town)
+                        driver = recycle_if_needed(driver, town)
+                    
                     # Auto-save after every 10 listings
                     if i % 10 == 0 and agent_data:
-                        df = pd.DataFrame(agent_data)
-                        df.to_csv(filename, index=False)
+                        save_progress()
                         print(f"💾 Auto-saved after {i} listings")
                     
                 except Exception as e:
@@ -805,32 +1225,21 @@ try:
                     # Check if we need to restart the browser
                     if consecutive_listing_errors >= max_consecutive_errors:
                         print(f"🔄 Too many consecutive errors ({consecutive_listing_errors}). Restarting browser...")
-                        try:
-                            driver.quit()
-                        except:
-                            print("⚠️ Error while closing browser")
-                            
-                        # Save data so far
-                        if agent_data:
-                            df = pd.DataFrame(agent_data)
-                            df.to_csv(filename, index=False)
-                            print(f"💾 Saved data before browser restart")
-                            
-                        # Create new browser instance
-                        driver = setup_browser()
-                        
-                        # Navigate back to the first page of current town
-                        print(f"Navigating to {town} after browser restart...")
-                        driver.get(get_town_url(town))
-                        wait_for_page_ready(driver)
+                        driver = restart_browser(driver, town, "errors")
                         
                         # Reset error counter
                         consecutive_listing_errors = 0
 
+            # Tabs still loading this town's listings (e.g. after a deadline) are free for the next town
+            listing_tab_urls.clear()
+
+            # Track listing throughput so single-tab and multi-tab runs can be compared
+            listing_throughput["listings"] += listings_processed
+            listing_throughput["seconds"] += time.time() - listing_phase_start
+
         # Save data after processing all listings for the town
         if agent_data:
-            df = pd.DataFrame(agent_data)
-            df.to_csv(filename, index=False)
+            save_progress()
             print(f"💾 Saved data for {town} to {filename}")
 
 except KeyboardInterrupt:
@@ -839,15 +1248,13 @@ except Exception as e:
     print(f"❌ An error occurred: {str(e)[:200]}...")
     # Save any data we've collected so far
     if agent_data:
-        df = pd.DataFrame(agent_data)
-        df.to_csv(filename, index=False)
+        save_progress()
         print(f"💾 Saved partial data to {filename}")
 finally:
     # Always try to save data at the end
     if agent_data:
         try:
-            df = pd.DataFrame(agent_data)
-            df.to_csv(filename, index=False)
+            save_progress()
 
             # Calculate and display timing information
             end_time = time.time()
@@ -857,9 +1264,73 @@ finally:
             print(f"⏱️ Scraped {total_listings} listings in {duration_minutes:.1f} minutes")
         except Exception as save_error:
             print(f"❌ Error saving final data: {save_error}")
+
+        # Upsert this run into the history database
+        try:
+            conn = open_store(history_db_path)
+            upsert_run(conn, agent_data, run_started_at.strftime('%Y-%m-%d %H:%M:%S'), source=os.path.abspath(filename))
+            conn.close()
+            print(f"🗄️ Run added to history database {history_db_path}")
+        except Exception as store_error:
+            print(f"❌ Error updating history database: {store_error}")
     else:
         print("⚠️ No data was collected during the scraping session.")
 
+    # Listing throughput for the configured tab count
+    if listing_throughput["seconds"] > 0:
+        rate = listing_throughput["listings"] / (listing_throughput["seconds"] / 60)
+        print(f"📊 Listing throughput: {rate:.1f} listings/min with {tabs_per_browser} tab(s)")
+
+    if archive_pages and os.path.exists(archive_filename):
+        print(f"📦 Raw pages archived to {archive_filename}")
+
+    # Where listing fields came from
+    if field_source_stats["listings"]:
+        total = field_source_stats["listings"]
+        print(f"🧾 Structured data covered every field on {field_source_stats['structured_only']}/{total} listings")
+        for field in LISTING_SELECTORS:
+            counts = ", ".join(
+                f"{source} {field_source_stats[f'{field}:{source}'] / total:.0%}"
+                for source in ("structured", "dom", "missing")
+            )
+            print(f"   {field}: {counts}")
+
+    # HTTP fast path hit rate and per-listing latency
+    if fast_path_stats["attempts"]:
+        hits = fast_path_stats["hits"]
+        print(f"⚡ HTTP fast path: {hits}/{fast_path_stats['attempts']} hits ({hits / fast_path_stats['attempts']:.0%})")
+        if hits:
+            print(f"⚡ Avg fast path latency: {fast_path_stats['hit_seconds'] / hits:.2f}s per listing")
+        if fast_path_fallbacks:
+            print(f"↪️ Fallbacks by reason: {dict(fast_path_fallbacks)}")
+    if fast_path_stats["browser_listings"]:
+        print(f"🌐 Avg browser latency: {fast_path_stats['browser_seconds'] / fast_path_stats['browser_listings']:.2f}s per listing")
+
+    # Yield-per-minute curve for new agents
+    if yield_samples:
+        try:
+            yield_filename = filename.replace(".csv", "_yield.csv")
+            pd.DataFrame(yield_samples).to_csv(yield_filename, index=False)
+            print(f"📈 Yield samples saved to {yield_filename}")
+        except Exception as save_error:
+            print(f"❌ Error saving yield samples: {save_error}")
+        print(f"📈 {len(new_agents_found)} new agents found")
+        for bucket_start, bucket_new, per_minute in summarize_yield(yield_samples):
+            print(f"   {bucket_start:>4}-{bucket_start + 5:<4} min: {bucket_new:>3} new agents ({per_minute:.2f}/min)")
+
+    # Export per-run memory samples and restart statistics
+    if memory_samples:
+        try:
+            memory_filename = filename.replace(".csv", "_memory.csv")
+            pd.DataFrame(memory_samples).to_csv(memory_filename, index=False)
+            print(f"🧠 Memory samples saved to {memory_filename}")
+        except Exception as save_error:
+            print(f"❌ Error saving memory samples: {save_error}")
+    rss_values = [sample["Chrome RSS MB"] for sample in memory_samples if sample["Chrome RSS MB"] != ""]
+    if rss_values:
+        print(f"🧠 Peak Chrome RSS: {max(rss_values):.0f} MB over {len(memory_samples)} samples")
+    print(f"🔄 Browser restarts: {browser_restarts['errors']} after errors, {browser_restarts['memory']} proactive memory recycles")
+
     # Close the browser
     try:
         driver.quit()
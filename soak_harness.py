@@ -0,0 +1,390 @@
+import argparse
+import csv
+import html
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import psutil
+
+from listing_scheduler import parse_budget
+
+SCRAPER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scraper_o2.py")
+
+AGENT_FIRST_NAMES = ["Jane", "Omar", "Priya", "Luc", "Mei", "Tom", "Ana", "Raj", "Sara", "Ken"]
+AGENT_LAST_NAMES = ["Doe", "Khan", "Patel", "Roy", "Chen", "Moore", "Silva", "Gill", "Lee", "Ito"]
+
+# Markers the scraper prints that the harness turns into events
+SUCCESS_MARKER = "Successfully scraped listing"
+BROWSER_SETUP_MARKER = "Setting up browser"
+FINISHED_MARKER = "Final data saved"
+RUN_ERROR_MARKER = "An error occurred"
+
+class FakeRealtorHandler(BaseHTTPRequestHandler):
+    """Serve map and listing pages shaped like realtor.ca, injecting the failures the scraper handles"""
+
+    # Set by start_fake_site()
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, status=200):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _roll(self, rate_name):
+        return random.random() < self.config[rate_name]
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == "/map":
+            page = int(parse_qs(parsed.query).get("page", ["1"])[0])
+            self._send(self.map_page(page))
+        elif parsed.path.startswith("/listing/"):
+            # Plain HTTP clients don't send fetch metadata, so they can be blocked separately
+            if "Sec-Fetch-Mode" not in self.headers and self._roll("http_block_rate"):
+                self._send("<html><body>Request unsuccessful. Incapsula incident ID: 0</body></html>")
+                return
+            # Simulated network latency for listing pages
+            time.sleep(self.config["listing_delay"])
+            self._send(self.listing_page(parsed.path.rsplit("/", 1)[-1]))
+        else:
+            self._send("<html><head><title>Fake REALTOR.ca</title></head><body>Home</body></html>")
+
+    def map_page(self, page):
+        pages = self.config["pages_per_town"]
+        cards = ""
+        if not self._roll("missing_cards_rate"):
+            for k in range(12):
+                listing_id = f"{page}-{k}-{uuid.uuid4().hex[:8]}"
+                cards += (
+                    f'<div class="cardCon"><div class="smallListingCardBodyWrap">'
+                    f'<a class="listingDetailsLink" href="/listing/{listing_id}">Listing {listing_id}</a>'
+                    f'<span class="smallListingCardTimeOnRealtor">{random.randint(1, 72)} hours ago</span>'
+                    f'</div></div>'
+                )
+
+        # pages_per_town 0 never runs out, so one scraper process keeps working for the whole soak
+        if (pages and page >= pages) or self._roll("disabled_next_rate"):
+            next_link = '<a class="lnkNextResultsPage" href="#" disabled="disabled">Next</a>'
+        else:
+            next_link = (
+                f'<a class="lnkNextResultsPage" href="#" '
+                f'onclick="location.href=\'/map?page={page + 1}\' + location.hash; return false;">Next</a>'
+            )
+
+        return (
+            f"<html><head><title>Map</title></head><body>"
+            f'<div class="mainFilter">Search</div>'
+            f'<span id="mapResultsNumVal">{(pages or 50) * 12}</span>'
+            f"{cards}{next_link}</body></html>"
+        )
+
+    def listing_page(self, listing_id):
+        agent = f"{random.choice(AGENT_FIRST_NAMES)} {random.choice(AGENT_LAST_NAMES)}"
+        address = "" if self._roll("listing_timeout_rate") else (
+            f'<div id="listingAddress">{random.randint(1, 999)} FAKE ST<br>Milton, Ontario</div>'
+        )
+        breadcrumb = json.dumps({
+            "@context": "https://schema.org",
+            "@type": "BreadcrumbList",
+            "itemListElement": [
+                {"@type": "ListItem", "position": 1, "name": "Ontario"},
+                {"@type": "ListItem", "position": 2, "name": "Milton"},
+            ],
+        })
+        return (
+            f"<html><head><title>Listing {html.escape(listing_id)}</title>"
+            f'<script type="application/ld+json">{breadcrumb}</script></head><body>'
+            f"{address}"
+            f'<div id="listingPrice">${random.randint(400, 2500) * 1000:,}</div>'
+            f'<span class="ConditionallyTimeOnRealtorCon">{random.randint(1, 72)} hours ago</span>'
+            f'<div id="btnPhotoCount">{random.randint(5, 50)}+</div>'
+            f'<div class="realtorCardName">{agent}</div>'
+            f'<span class="realtorCardContactNumber">905-555-{random.randint(1000, 9999)}</span>'
+            f'<a class="agent-email" href="mailto:{agent.replace(" ", ".").lower()}@example.com">Email</a>'
+            f'<div class="officeCardName">Fake Realty Inc.</div>'
+            f"</body></html>"
+        )
+
+def start_fake_site(config):
+    """Start the fake site on a free local port and return the server"""
+    handler = type("ConfiguredFakeRealtorHandler", (FakeRealtorHandler,), {"config": config})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def process_tree_rss_mb(process):
+    """RSS of a process and all its descendants in MB"""
+    total = 0
+    try:
+        processes = [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0.0
+    for child in processes:
+        try:
+            total += child.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total / (1024 * 1024)
+
+def kill_browser(process):
+    """Kill every Chrome process under the scraper to simulate a lost browser session"""
+    killed = 0
+    try:
+        children = process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0
+    for child in children:
+        try:
+            if "chrome" in child.name().lower():
+                child.kill()
+                killed += 1
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return killed
+
+def launch_scraper(base_url, work_dir, answers="\n50\n\n", extra_env=None):
+    """Start scraper_o2.py against the fake site, answering its prompts
+
+    The default answers pick all towns, 50 pages per town and no time budget.
+    """
+    env = dict(os.environ, REALTOR_BASE_URL=base_url, PYTHONIOENCODING="utf-8", **(extra_env or {}))
+    scraper = subprocess.Popen(
+        [sys.executable, "-u", SCRAPER_PATH],
+        cwd=work_dir, env=env, text=True, encoding="utf-8", errors="replace",
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    )
+    # Towns, pages per town, time budget
+    scraper.stdin.write(answers)
+    scraper.stdin.flush()
+    return scraper
+
+def watch_output(scraper, events, soak_start, log_file):
+    """Turn scraper output lines into timestamped events"""
+    for line in scraper.stdout:
+        log_file.write(line)
+        elapsed = time.time() - soak_start
+        if SUCCESS_MARKER in line:
+            events["listings"].append(elapsed)
+        elif BROWSER_SETUP_MARKER in line:
+            events["browser_setups"].append(elapsed)
+        elif FINISHED_MARKER in line:
+            events["run_ends"].append(elapsed)
+        elif RUN_ERROR_MARKER in line:
+            events["run_errors"].append(elapsed)
+
+def finished_cleanly(scraper, events, launched_at):
+    """Whether the scraper's exit was the normal end of a run rather than a crash"""
+    return (
+        scraper.returncode == 0
+        and any(t >= launched_at for t in events["run_ends"])
+        and not any(t >= launched_at for t in events["run_errors"])
+    )
+
+def stop_scraper(scraper):
+    """Ask the scraper to save its data and quit the browser, killing it if it doesn't"""
+    try:
+        scraper.send_signal(signal.SIGINT)
+    except ValueError:
+        # Windows only supports CTRL events for process groups
+        scraper.terminate()
+    try:
+        scraper.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        for child in psutil.Process(scraper.pid).children(recursive=True):
+            child.kill()
+        scraper.kill()
+
+def run_soak(args):
+    """Drive the scraper against the fake site for the configured duration and collect samples"""
+    config = {
+        "pages_per_town": args.pages_per_town,
+        "missing_cards_rate": args.missing_cards_rate,
+        "disabled_next_rate": args.disabled_next_rate,
+        "listing_timeout_rate": args.listing_timeout_rate,
+        "http_block_rate": args.http_block_rate,
+        "listing_delay": args.listing_delay,
+    }
+    server = start_fake_site(config)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    work_dir = tempfile.mkdtemp(prefix="soak_")
+    print(f"🧪 Fake site at {base_url}, scraper output in {work_dir}")
+
+    events = {
+        "listings": [], "browser_setups": [], "launches": [], "relaunches": [], "exits": [], "kills": [],
+        "run_ends": [], "run_errors": [],
+    }
+    rss_samples = []
+    soak_start = time.time()
+    deadline = soak_start + args.duration
+    next_kill = soak_start + args.kill_interval if args.kill_interval else None
+
+    log_file = open(os.path.join(work_dir, "scraper_output.log"), "w", encoding="utf-8")
+    scraper = None
+    watcher = None
+    try:
+        while time.time() < deadline:
+            # The scraper ends after its last town; relaunch it then, but count any other exit as a failure
+            if scraper is not None and scraper.poll() is not None:
+                watcher.join(timeout=10)
+                elapsed = time.time() - soak_start
+                if finished_cleanly(scraper, events, events["launches"][-1]):
+                    events["relaunches"].append(elapsed)
+                    print(f"🔁 Scraper finished its towns at {elapsed / 60:.1f} min. Relaunching")
+                else:
+                    events["exits"].append((elapsed, scraper.returncode))
+                    print(f"⚠️ Scraper exited with code {scraper.returncode} at {elapsed / 60:.1f} min")
+                scraper = None
+            if scraper is None:
+                scraper = launch_scraper(base_url, work_dir)
+                events["launches"].append(time.time() - soak_start)
+                process = psutil.Process(scraper.pid)
+                watcher = threading.Thread(
+                    target=watch_output, args=(scraper, events, soak_start, log_file), daemon=True
+                )
+                watcher.start()
+                print(f"🚀 Scraper launch {len(events['launches'])}")
+
+            rss_samples.append((time.time() - soak_start, process_tree_rss_mb(process)))
+
+            if next_kill and time.time() >= next_kill:
+                if kill_browser(process):
+                    events["kills"].append(time.time() - soak_start)
+                    print(f"💥 Killed browser session at {(time.time() - soak_start) / 60:.1f} min")
+                next_kill += args.kill_interval
+
+            time.sleep(args.sample_interval)
+    except KeyboardInterrupt:
+        print("🛑 Soak test interrupted. Evaluating collected samples.")
+    finally:
+        try:
+            if scraper is not None and scraper.poll() is None:
+                stop_scraper(scraper)
+        finally:
+            server.shutdown()
+            log_file.close()
+
+    return events, rss_samples, time.time() - soak_start, work_dir
+
+def evaluate(events, rss_samples, elapsed, args, work_dir):
+    """Write the throughput/RSS timeline and return a list of threshold failures"""
+    window = args.window_minutes * 60
+    windows = []
+    for index in range(int(elapsed // window)):
+        start, end = index * window, (index + 1) * window
+        listings = sum(1 for t in events["listings"] if start <= t < end)
+        rss = [mb for t, mb in rss_samples if start <= t < end]
+        # Browser setups beyond one per launch are restarts
+        setups = sum(1 for t in events["browser_setups"] if start <= t < end)
+        launches = sum(1 for t in events["launches"] if start <= t < end)
+        windows.append({
+            "Window Start Minutes": index * args.window_minutes,
+            "Listings": listings,
+            "Listings Per Minute": round(listings / args.window_minutes, 2),
+            "Browser Restarts": max(0, setups - launches),
+            "Injected Kills": sum(1 for t in events["kills"] if start <= t < end),
+            "Scraper Exits": sum(1 for t, _ in events["exits"] if start <= t < end),
+            "Relaunches": sum(1 for t in events["relaunches"] if start <= t < end),
+            "Median RSS MB": round(statistics.median(rss), 1) if rss else ""
+        })
+
+    timeline_path = os.path.join(work_dir, "soak_timeline.csv")
+    if windows:
+        with open(timeline_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(windows[0]))
+            writer.writeheader()
+            writer.writerows(windows)
+        print(f"📈 Timeline saved to {timeline_path}")
+        for w in windows:
+            print(f"   {w['Window Start Minutes']:>4} min: {w['Listings Per Minute']:>6.2f} listings/min, "
+                  f"{w['Browser Restarts']} restarts, {w['Scraper Exits']} exits, {w['Relaunches']} relaunches, RSS {w['Median RSS MB']} MB")
+
+    failures = []
+    # A crash or error exit is a failure; finishing every town and being relaunched is not
+    if events["exits"]:
+        codes = ", ".join(str(code) for _, code in events["exits"])
+        failures.append(
+            f"Scraper crashed or exited with an error {len(events['exits'])} time(s) (exit codes {codes}); "
+            f"see scraper_output.log in {work_dir}"
+        )
+
+    if len(windows) < 2:
+        failures.append(f"Only {len(windows)} complete {args.window_minutes}-minute windows; run longer to judge stability")
+        return failures
+
+    # The first window includes browser start-up, so compare against the second when there are enough
+    baseline = windows[1] if len(windows) >= 3 else windows[0]
+    final = windows[-1]
+
+    if baseline["Listings Per Minute"] == 0:
+        failures.append("No listings were scraped in the baseline window")
+    elif final["Listings Per Minute"] < baseline["Listings Per Minute"] * args.min_throughput_ratio:
+        failures.append(
+            f"Throughput decayed from {baseline['Listings Per Minute']} to {final['Listings Per Minute']} "
+            f"listings/min (below {args.min_throughput_ratio:.0%} of baseline)"
+        )
+
+    restarts = sum(w["Browser Restarts"] for w in windows)
+    excess_restarts_per_hour = max(0, restarts - len(events["kills"])) / (elapsed / 3600)
+    if excess_restarts_per_hour > args.max_restarts_per_hour:
+        failures.append(
+            f"{excess_restarts_per_hour:.1f} restarts/hour beyond injected kills "
+            f"(limit {args.max_restarts_per_hour})"
+        )
+
+    if baseline["Median RSS MB"] != "" and final["Median RSS MB"] != "":
+        growth = final["Median RSS MB"] - baseline["Median RSS MB"]
+        if growth > args.max_rss_growth_mb:
+            failures.append(f"RSS grew by {growth:.0f} MB (limit {args.max_rss_growth_mb} MB)")
+
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-test the scraper against a local fake site with injected faults")
+    parser.add_argument("--duration", default="2h", help="How long to run, e.g. 45m or 2h (default: 2h)")
+    parser.add_argument("--pages-per-town", type=int, default=0, help="Map pages per town before next is disabled (0: no site limit; the scraper stops at 50)")
+    parser.add_argument("--missing-cards-rate", type=float, default=0.05, help="Share of map pages without listing cards")
+    parser.add_argument("--disabled-next-rate", type=float, default=0.01, help="Share of map pages with a disabled next link")
+    parser.add_argument("--listing-timeout-rate", type=float, default=0.03, help="Share of listing pages without #listingAddress")
+    parser.add_argument("--http-block-rate", type=float, default=0.5, help="Share of plain-HTTP listing requests blocked")
+    parser.add_argument("--listing-delay", type=float, default=0.0, help="Seconds the fake site waits before serving a listing")
+    parser.add_argument("--kill-interval", default="20m", help="Kill the browser this often, e.g. 20m (0 to disable)")
+    parser.add_argument("--sample-interval", type=float, default=5, help="Seconds between RSS samples")
+    parser.add_argument("--window-minutes", type=int, default=10, help="Throughput window length in minutes")
+    parser.add_argument("--min-throughput-ratio", type=float, default=0.6, help="Final/baseline throughput must stay above this")
+    parser.add_argument("--max-restarts-per-hour", type=float, default=6, help="Allowed restarts/hour beyond injected kills")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=800, help="Allowed RSS growth from baseline to final window")
+    args = parser.parse_args()
+    args.duration = parse_budget(args.duration)
+    args.kill_interval = parse_budget(args.kill_interval) if args.kill_interval != "0" else None
+
+    events, rss_samples, elapsed, work_dir = run_soak(args)
+    print(f"\n⏱️ Soak ran {elapsed / 60:.1f} minutes: {len(events['listings'])} listings, "
+          f"{len(events['launches'])} launches ({len(events['relaunches'])} after a finished run), "
+          f"{len(events['exits'])} failed exits, {len(events['kills'])} injected kills")
+
+    failures = evaluate(events, rss_samples, elapsed, args, work_dir)
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Throughput, restarts and memory stayed within thresholds")
+
+if __name__ == "__main__":
+    main()